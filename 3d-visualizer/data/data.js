@@ -2,6 +2,7 @@ import { copyToClipboard } from '../utils.js';
 
 export const DATASETS = [
   'output',
+  'output.bin',
   '2c-test',
   '100-10x40x20',
   '100-80x10x10',
@@ -39,14 +40,51 @@ export function setStoredDataset(dataset) {
 
 export function loadDataset(dataset) {
   console.log('Loading dataset:', dataset);
-  return fetch(`./data/${dataset}.json`)
-    .then(res => res.json())
+  const binary = dataset.endsWith('.bin');
+  return fetch(binary ? `./data/${dataset}` : `./data/${dataset}.json`)
+    .then(res => (binary ? res.arrayBuffer().then(parseBinaryDataset) : res.json()))
     .catch(error => {
       console.error('Error loading dataset:', error);
       throw error;
     });
 }
 
+const BINARY_MAGIC = 'PKCB';
+const BINARY_VERSION = 1;
+
+// Columnar format written by save_packing_results_binary in backend/packing/packing_test.py
+export function parseBinaryDataset(buffer) {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  const version = view.getUint32(4, true);
+  if (magic !== BINARY_MAGIC || version !== BINARY_VERSION) {
+    throw new Error(`Unsupported binary dataset (${magic} v${version})`);
+  }
+  const count = view.getUint32(8, true);
+  const metaLength = view.getUint32(12, true);
+  const meta = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 16, metaLength)));
+
+  // Typed arrays need the host to be little-endian, which every browser target is
+  let offset = 16 + metaLength;
+  const positions = new Float32Array(buffer, offset, count * 3);
+  offset += count * 12;
+  const sizes = new Float32Array(buffer, offset, count * 3);
+  offset += count * 12;
+  const containerIndices = new Uint32Array(buffer, offset, count);
+
+  const items = new Array(count);
+  for (let i = 0; i < count; i++) {
+    const k = i * 3;
+    items[i] = {
+      id: meta.itemIds ? meta.itemIds[i] : undefined,
+      size: { width: sizes[k], height: sizes[k + 1], depth: sizes[k + 2] },
+      position: { x: positions[k], y: positions[k + 1], z: positions[k + 2] },
+      container_id: meta.containers[containerIndices[i]].id,
+    };
+  }
+  return { containers: meta.containers, items };
+}
+
 export function exportDataset(items) {
   const itemsData = items.map(item => ({
     size: { ...item.size },
@@ -3,4 +3,9 @@ class Config:
   PORT = 8000
   HOST = '0.0.0.0'
   UPLOAD_FOLDER = '/tmp/uploads'
+  INVENTORY_DIR = '/tmp/inventory'  # Snapshot and journal of the station inventory
   MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+  PLACEMENT_DEADLINE_MS = 2000  # Time budget for /api/placement
+  PLACEMENT_WORKERS = 4
+  PLACEMENT_COUNTERS = False  # Return packing hot-path counters with /api/placement
+  SEARCH_CACHE_SIZE = 1024  # Search responses kept by /api/search and /api/retrieve
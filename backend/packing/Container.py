@@ -1,5 +1,24 @@
-from .FreeSpace import FreeSpace, try_merge, TOL
-from itertools import permutations
+from .FreeSpace import FreeSpace, try_merge, contains, TOL
+from .FreeSpaceIndex import FreeSpaceIndex
+from .FaceIndex import FaceIndex
+from .NumpyFreeSpaces import NumpyFreeSpaces
+from .Occupancy import OccupancyMap
+from .PlacementTable import PlacementTable
+from .Item import intern_text
+from array import array
+from itertools import count, permutations
+from functools import lru_cache
+from time import perf_counter
+
+FREE_SPACE_BACKENDS = {
+    "object": FreeSpaceIndex,
+    "numpy": NumpyFreeSpaces,
+}
+
+ORIENTATION_CACHE_SIZE = 4096
+# Container versions are drawn from one counter, so no two containers (or two
+# states of one container) ever share a version
+VERSIONS = count(1)
 
 
 def get_orientations(item):
@@ -7,7 +26,21 @@ def get_orientations(item):
   return {perm for perm in permutations(dims)}
 
 
-def trim_free_space(fs, placed_bounds):
+# Order in which orientations (w, d, h) are tried; "default" is narrowest first
+ORIENTATION_POLICIES = {
+    "default": lambda o: (o[0], o[2], o[1]),
+    "flat": lambda o: (o[2], o[0], o[1]),
+    "shallow": lambda o: (o[1], o[0], o[2]),
+}
+
+
+@lru_cache(maxsize=ORIENTATION_CACHE_SIZE)
+def orientation_table(shape, policy="default"):
+  # Distinct orientations of a (width, depth, height) shape in placement order
+  return tuple(sorted({perm for perm in permutations(shape)}, key=ORIENTATION_POLICIES[policy]))
+
+
+def trim_free_space(fs, placed_bounds, maximal=False):
   fx1, fy1, fz1, fx2, fy2, fz2 = fs.get_bounds()
   px1, py1, pz1, px2, py2, pz2 = placed_bounds
 
@@ -17,89 +50,546 @@ def trim_free_space(fs, placed_bounds):
     return [fs]
 
   new_spaces = []
-  if px1 > fx1 + TOL:
-    new_spaces.append(FreeSpace(fx1, fy1, fz1, px1 - fx1, fs.height, fs.depth, fs.source))
-  if px2 < fx2 - TOL:
-    new_spaces.append(FreeSpace(px2, fy1, fz1, fx2 - px2, fs.height, fs.depth, fs.source))
-  if py1 > fy1 + TOL:
-    new_spaces.append(FreeSpace(max(fx1, px1), fy1, fz1, min(fx2, px2) - max(fx1, px1), py1 - fy1, fs.depth, fs.source))
-  if py2 < fy2 - TOL:
-    new_spaces.append(FreeSpace(max(fx1, px1), py2, fz1, min(fx2, px2) - max(fx1, px1), fy2 - py2, fs.depth, fs.source))
-  if pz1 > fz1 + TOL:
-    new_spaces.append(FreeSpace(max(fx1, px1), max(fy1, py1), fz1, min(fx2, px2) - max(fx1, px1),
-                                min(fy2, py2) - max(fy1, py1), pz1 - fz1, fs.source))
-  if pz2 < fz2 - TOL:
-    new_spaces.append(FreeSpace(max(fx1, px1), max(fy1, py1), pz2, min(fx2, px2) - max(fx1, px1),
-                                min(fy2, py2) - max(fy1, py1), fz2 - pz2, fs.source))
+  if maximal:
+    # Maximal spaces: each split keeps the full extent of fs on the other two axes
+    if px1 > fx1 + TOL:
+      new_spaces.append(FreeSpace(fx1, fy1, fz1, px1 - fx1, fs.height, fs.depth, fs.source))
+    if px2 < fx2 - TOL:
+      new_spaces.append(FreeSpace(px2, fy1, fz1, fx2 - px2, fs.height, fs.depth, fs.source))
+    if py1 > fy1 + TOL:
+      new_spaces.append(FreeSpace(fx1, fy1, fz1, fs.width, py1 - fy1, fs.depth, fs.source))
+    if py2 < fy2 - TOL:
+      new_spaces.append(FreeSpace(fx1, py2, fz1, fs.width, fy2 - py2, fs.depth, fs.source))
+    if pz1 > fz1 + TOL:
+      new_spaces.append(FreeSpace(fx1, fy1, fz1, fs.width, fs.height, pz1 - fz1, fs.source))
+    if pz2 < fz2 - TOL:
+      new_spaces.append(FreeSpace(fx1, fy1, pz2, fs.width, fs.height, fz2 - pz2, fs.source))
+  else:
+    if px1 > fx1 + TOL:
+      new_spaces.append(FreeSpace(fx1, fy1, fz1, px1 - fx1, fs.height, fs.depth, fs.source))
+    if px2 < fx2 - TOL:
+      new_spaces.append(FreeSpace(px2, fy1, fz1, fx2 - px2, fs.height, fs.depth, fs.source))
+    if py1 > fy1 + TOL:
+      new_spaces.append(FreeSpace(max(fx1, px1), fy1, fz1, min(fx2, px2) - max(fx1, px1), py1 - fy1, fs.depth, fs.source))
+    if py2 < fy2 - TOL:
+      new_spaces.append(FreeSpace(max(fx1, px1), py2, fz1, min(fx2, px2) - max(fx1, px1), fy2 - py2, fs.depth, fs.source))
+    if pz1 > fz1 + TOL:
+      new_spaces.append(FreeSpace(max(fx1, px1), max(fy1, py1), fz1, min(fx2, px2) - max(fx1, px1),
+                                  min(fy2, py2) - max(fy1, py1), pz1 - fz1, fs.source))
+    if pz2 < fz2 - TOL:
+      new_spaces.append(FreeSpace(max(fx1, px1), max(fy1, py1), pz2, min(fx2, px2) - max(fx1, px1),
+                                  min(fy2, py2) - max(fy1, py1), fz2 - pz2, fs.source))
 
   valid_spaces = [space for space in new_spaces if space.width > TOL and space.height > TOL and space.depth > TOL]
   return valid_spaces
 
 
+def prune_dominated(spaces, neighbours):
+  # Largest first, so a space is only checked against survivors and neighbours
+  others = [fs.get_bounds() for fs in neighbours]
+  kept = []
+  for fs in sorted(spaces, key=lambda s: s.width * s.height * s.depth, reverse=True):
+    bounds = fs.get_bounds()
+    if any(contains(other, bounds) for other in others):
+      continue
+    others.append(bounds)
+    kept.append(fs)
+  return kept
+
+
+def new_counters():
+  # Calls and seconds for each hot-path method, plus the free space work done:
+  # spaces scanned and split by trims, merge worklist passes and merges made
+  counters = {}
+  for name in ("place_item", "place_batch", "trim", "merge"):
+    counters[name] = 0
+    counters[name + "_time"] = 0.0
+  counters.update(spaces_scanned=0, splits=0, merge_passes=0, merges=0)
+  return counters
+
+
+def add_counters(total, counters):
+  for key, value in counters.items():
+    total[key] = total.get(key, 0) + value
+  return total
+
+
+def grid_coords(start, size, limit):
+  # Start of each grid cell along one axis, plus the end of the last cell
+  coords = [start]
+  while coords[-1] + size <= limit + TOL:
+    coords.append(coords[-1] + size)
+  return coords
+
+
+def grid_columns(xs, ys, zs, orient, count):
+  # x, y, z, width, depth, height of the first count cells of a grid (x fastest,
+  # then y, then z) as a flat array, filled one strided column at a time
+  nx, ny = len(xs) - 1, len(ys) - 1
+  layers = -(-count // (nx * ny))
+  layer_ys = array("d")
+  for y in ys[:ny]:
+    layer_ys += array("d", (y,)) * nx
+  column_zs = array("d")
+  for z in zs[:layers]:
+    column_zs += array("d", (z,)) * (nx * ny)
+  coords = array("d", (0.0, 0.0, 0.0) + tuple(orient)) * count
+  coords[0::6] = (array("d", xs[:nx]) * (ny * layers))[:count]
+  coords[1::6] = (layer_ys * layers)[:count]
+  coords[2::6] = column_zs[:count]
+  return coords
+
+
 class Container:
-  def __init__(self, container_id, zone, width, depth, height):
+  def __init__(self, container_id, zone, width, depth, height, maximal_spaces=False, free_space_backend="object"):
     self.id = container_id
-    self.zone = zone
+    self.zone = intern_text(zone)
     self.width = width
     self.depth = depth
     self.height = height
-    self.placements = []
-    self.free_spaces = [FreeSpace(0, 0, 0, self.width, self.height, self.depth)]
+    self.maximal_spaces = maximal_spaces
+    self.orientation_policy = "default"
+    self.free_space_stats = {"before_prune": 0, "after_prune": 0, "pruned": 0, "peak": 1}
+    self.occupancy = None
+    self.version = 0  # See touch
+    self.placements = PlacementTable()
+    self.counters = None  # See enable_counters
+    self.undo_log = None  # See begin
+    self.transactions = []
+    self.set_free_space_backend(free_space_backend, [FreeSpace(0, 0, 0, self.width, self.height, self.depth)])
 
   def __repr__(self):
     return f"Container({self.id}, Zone:{self.zone})"
 
+  def __getstate__(self):
+    # Copies and pickles (e.g. for worker processes) start outside any transaction
+    state = self.__dict__.copy()
+    state["undo_log"] = None
+    state["transactions"] = []
+    return state
+
+  @property
+  def placements(self):
+    return self._placements
+
+  @placements.setter
+  def placements(self, placements):
+    # Any sequence of (item, pos, orient) is stored as a PlacementTable
+    self._placements = placements if isinstance(placements, PlacementTable) else PlacementTable(placements)
+    self.rebuild_occupancy()
+    self.touch()
+
+  @property
+  def free_spaces(self):
+    return list(self.free_space_index)
+
+  @free_spaces.setter
+  def free_spaces(self, spaces):
+    self.free_space_index.rebuild(spaces)
+    # The numpy backend finds merge partners itself
+    self.face_index = FaceIndex(spaces) if self.free_space_backend == "object" else None
+
+  def set_free_space_backend(self, backend, spaces=None):
+    if backend not in FREE_SPACE_BACKENDS:
+      raise ValueError(f"Unknown free space backend: {backend}")
+    if spaces is None:
+      spaces = self.free_spaces
+    self.free_space_backend = backend
+    self.free_space_index = FREE_SPACE_BACKENDS[backend]()
+    self.free_spaces = spaces
+
   def total_mass(self):
     return sum(item.mass_kg for item, _, _ in self.placements)
 
+  def touch(self):
+    # New version after a change to the placements, for caches keyed on it
+    self.version = next(VERSIONS)
+
   def add_placement(self, item, pos, orient):
-    self.placements.append((item, pos, orient))
+    self._placements.append((item, pos, orient))
+    if self.occupancy is not None:
+      self.occupancy.add(item, pos, orient)
+    if self.undo_log is not None:
+      self.undo_log.append(("place", item.id))
+    self.touch()
+
+  def add_placements(self, items, coords):
+    # add_placement for many items at once, coords as in PlacementTable.extend_columns
+    start = len(self._placements)
+    self._placements.extend_columns(items, coords)
+    if self.occupancy is not None:
+      for item, pos, orient in self._placements[start:]:
+        self.occupancy.add(item, pos, orient)
+    if self.undo_log is not None:
+      self.undo_log.extend(("place", item.id) for item in items)
+    self.touch()
+
+  def begin(self):
+    """
+    Start a transaction: placements and free-space changes are logged until
+    the matching commit() or rollback(), which undoes them in reverse. Costs
+    are proportional to what changes, not to the container's size (the numpy
+    backend is the exception, it saves its free spaces at begin). Transactions
+    nest. Assigning placements or free spaces, or switching the backend,
+    inside one is not supported.
+    """
+    if self.undo_log is None:
+      self.undo_log = []
+    spaces = self.free_spaces if self.free_space_backend == "numpy" else None
+    self.transactions.append((len(self.undo_log), self.version, dict(self.free_space_stats), spaces))
+
+  def commit(self):
+    self.transactions.pop()
+    if not self.transactions:
+      self.undo_log = None
+
+  def rollback(self):
+    start, version, stats, spaces = self.transactions.pop()
+    log = self.undo_log
+    while len(log) > start:
+      entry = log.pop()
+      op = entry[0]
+      if op == "place":
+        del self._placements[self._placements.slot(entry[1])]
+        if self.occupancy is not None:
+          self.occupancy.remove(entry[1])
+      elif op == "remove":
+        _, index, placement = entry
+        self._placements.insert(index, placement)
+        if self.occupancy is not None:
+          self.occupancy.add(*placement)
+      elif spaces is not None:
+        continue  # The numpy backend is restored below
+      elif op == "add_space":
+        self.free_space_index.remove(entry[1])
+        self.face_index.discard(entry[1])
+      else:  # "remove_space"
+        self.free_space_index.insert(entry[1], entry[2])
+        self.face_index.add(entry[1])
+    if spaces is not None:
+      self.free_spaces = spaces
+    # The state is what it was at begin, so cached results for that version hold again
+    self.version = version
+    self.free_space_stats = stats
+    if not self.transactions:
+      self.undo_log = None
+
+  def enable_occupancy(self, cells=32):
+    # Optional depth map of the open face, kept in sync with placements
+    self.occupancy = OccupancyMap(self.width, self.height, self.depth, cells)
+    for item, pos, orient in self.placements:
+      self.occupancy.add(item, pos, orient)
+
+  def rebuild_occupancy(self):
+    if self.occupancy is not None:
+      self.enable_occupancy(self.occupancy.cells)
+
+  def items_in_front(self, pos, orient):
+    # Placements blocking the box from the open face, nearest the face first
+    if self.occupancy is None:
+      self.enable_occupancy()
+    return self.occupancy.items_in_front(pos, orient)
+
+  def items_in_box(self, pos, orient, limit=None):
+    if self.occupancy is None:
+      self.enable_occupancy()
+    return self.occupancy.items_in_box(pos, orient, limit)
+
+  def is_free(self, x, y, z):
+    if self.occupancy is None:
+      self.enable_occupancy()
+    return self.occupancy.is_free(x, y, z)
+
+  def enable_counters(self):
+    # Off (None) by default, which costs one check per counted call
+    self.counters = new_counters()
+
+  def timed(self, name, method, *args):
+    start = perf_counter()
+    result = method(*args)
+    self.counters[name] += 1
+    self.counters[name + "_time"] += perf_counter() - start
+    return result
+
+  def capacity_summary(self):
+    # (free volume, largest free width/height/depth sorted ascending)
+    volume, dims = self.free_space_index.summary()
+    return volume, tuple(sorted(dims))
+
+  def may_fit(self, item):
+    # Necessary condition only: False means no free space can hold the item
+    volume, (a, b, c) = self.capacity_summary()
+    x, y, z = sorted(item.shape)
+    return (x <= a + TOL and y <= b + TOL and z <= c + TOL and
+            item.width * item.depth * item.height <= volume * (1 + 1e-9) + TOL)
+
+  def add_free_space(self, fs):
+    self.free_space_index.insert(fs)
+    if self.face_index is not None:
+      self.face_index.add(fs)
+    if self.undo_log is not None:
+      self.undo_log.append(("add_space", fs))
 
   def remove_free_space(self, fs):
-    if fs in self.free_spaces:
-      self.free_spaces.remove(fs)
+    key = self.free_space_index.remove(fs)
+    if key and self.face_index is not None:
+      self.face_index.discard(fs)
+    if key and self.undo_log is not None:
+      self.undo_log.append(("remove_space", fs, key))
 
   def update_free_spaces_with_trim(self, placed_item, pos, orient):
     px, py, pz = pos
     iw, id_, ih = orient
-    placed_bounds = (px, py, pz, px + iw, py + ih, pz + id_)
-    new_free_spaces = []
-    for fs in self.free_spaces:
+    self.trim_placed_box((px, py, pz, px + iw, py + ih, pz + id_))
+
+  def trim_placed_box(self, placed_bounds):
+    if self.counters is not None:
+      return self.timed("trim", self._trim_placed_box, placed_bounds)
+    self._trim_placed_box(placed_bounds)
+
+  def _trim_placed_box(self, placed_bounds):
+    if self.free_space_backend == "numpy":
+      before, after = self.free_space_index.trim(placed_bounds, self.maximal_spaces)
+      self.record_peak(before)
+      if self.counters is not None:
+        scanned, splits = self.free_space_index.last_trim
+        self.record_trim(scanned, splits)
+        if not self.maximal_spaces:
+          # This backend merges inside trim
+          self.counters["merges"] += before - after
+          self.counters["merge_passes"] += splits + before - after
+      if self.maximal_spaces:
+        self.record_prune(before, after)
+      return
+    if self.maximal_spaces:
+      self.trim_maximal_spaces(placed_bounds)
+      return
+    new_spaces = []
+    touching = self.free_space_index.touching(placed_bounds)
+    for fs in touching:
       trimmed = trim_free_space(fs, placed_bounds)
-      new_free_spaces.extend(trimmed)
-    self.free_spaces = [fs for fs in new_free_spaces if fs.width > TOL and fs.height > TOL and fs.depth > TOL]
-    self.merge_free_spaces()
-
-  def merge_free_spaces(self):
-    merged = True
-    while merged:
-      merged = False
-      new_spaces = []
-      used = [False] * len(self.free_spaces)
-      for i in range(len(self.free_spaces)):
-        if used[i]:
-          continue
-        fs1 = self.free_spaces[i]
-        for j in range(i+1, len(self.free_spaces)):
-          if used[j]:
-            continue
-          fs2 = self.free_spaces[j]
-          merged_box = try_merge(fs1, fs2)
-          if merged_box:
-            fs1 = merged_box
-            used[j] = True
-            merged = True
-        new_spaces.append(fs1)
-      self.free_spaces = new_spaces
+      if len(trimmed) == 1 and trimmed[0] is fs:
+        continue
+      self.remove_free_space(fs)
+      new_spaces.extend(trimmed)
+    for fs in new_spaces:
+      self.add_free_space(fs)
+    self.record_peak(len(self.free_space_index))
+    if self.counters is not None:
+      self.record_trim(len(touching), len(new_spaces))
+    self.merge_free_spaces(new_spaces)
+
+  def trim_maximal_spaces(self, placed_bounds):
+    # Only spaces touching the placed box can be split by it or contain one of its splits
+    neighbours = []
+    new_spaces = []
+    touching = self.free_space_index.touching(placed_bounds)
+    for fs in touching:
+      trimmed = trim_free_space(fs, placed_bounds, maximal=True)
+      if len(trimmed) == 1 and trimmed[0] is fs:
+        neighbours.append(fs)
+      else:
+        self.remove_free_space(fs)
+        new_spaces.extend(trimmed)
+    before = len(self.free_space_index) + len(new_spaces)
+    self.record_peak(before)
+    if self.counters is not None:
+      self.record_trim(len(touching), len(new_spaces))
+    for fs in prune_dominated(new_spaces, neighbours):
+      self.add_free_space(fs)
+    self.record_prune(before, len(self.free_space_index))
+
+  def record_peak(self, count):
+    # Most free spaces held at once, counted before merging or pruning
+    if count > self.free_space_stats["peak"]:
+      self.free_space_stats["peak"] = count
+
+  def record_trim(self, scanned, splits):
+    self.counters["spaces_scanned"] += scanned
+    self.counters["splits"] += splits
+
+  def record_prune(self, before, after):
+    self.free_space_stats["before_prune"] = before
+    self.free_space_stats["after_prune"] = after
+    self.free_space_stats["pruned"] += before - after
+
+  def merge_free_spaces(self, changed=None):
+    if self.counters is None:
+      return self._merge_free_spaces(changed)
+    # Every merge removes one space and queues the result, so passes over
+    # the worklist follow from the space count
+    before = len(self.free_space_index)
+    self.timed("merge", self._merge_free_spaces, changed)
+    merges = before - len(self.free_space_index)
+    self.counters["merges"] += merges
+    self.counters["merge_passes"] += (before if changed is None else len(changed)) + merges
+
+  def _merge_free_spaces(self, changed=None):
+    # Spaces that were not changed are already unmergeable with each other,
+    # so only the changed ones (and what they merge into) need a lookup
+    if self.free_space_backend == "numpy":
+      self.free_space_index.merge(changed)
+      return
+    pending = self.free_spaces if changed is None else list(changed)
+    while pending:
+      fs = pending.pop()
+      if fs not in self.free_space_index:
+        continue
+      other = self.face_index.find_neighbour(fs)
+      if other is None:
+        continue
+      merged = try_merge(fs, other)
+      self.remove_free_space(fs)
+      self.remove_free_space(other)
+      self.add_free_space(merged)
+      pending.append(merged)
+
+  def remove_item(self, item_id):
+    # Returns the removed item, or None if it is not in this container
+    index = self.placements.slot(item_id)
+    if index is None:
+      return None
+    item, pos, orient = self.remove_slot(index)
+    self.touch()
+    self.release_box(pos, orient)
+    return item
+
+  def remove_slot(self, index):
+    # Takes the placement at index out of the table, returns it
+    placement = self.placements[index]
+    del self.placements[index]
+    if self.occupancy is not None:
+      self.occupancy.remove(placement[0].id)
+    if self.undo_log is not None:
+      self.undo_log.append(("remove", index, placement))
+    return placement
+
+  def remove_items(self, item_ids):
+    # remove_item for many items, compacting the placements once; returns the removed items
+    slots = sorted({self.placements.slot(item_id) for item_id in item_ids} - {None}, reverse=True)
+    removed = self.remove_slots(slots)
+    if removed:
+      self.touch()
+    for _, pos, orient in removed:
+      self.release_box(pos, orient)
+    return [item for item, _, _ in removed]
+
+  def remove_slots(self, slots):
+    # remove_slot for slots sorted from the back, compacting the table once
+    removed = [self.placements[index] for index in slots]
+    self.placements.delete_slots(slots)
+    if self.occupancy is not None:
+      for item, _, _ in removed:
+        self.occupancy.remove(item.id)
+    if self.undo_log is not None:
+      # Logged as one-by-one removals from the back, which rollback undoes front first
+      self.undo_log.extend(("remove", index, placement) for index, placement in zip(slots, removed))
+    return removed
+
+  def release_box(self, pos, orient):
+    """
+    Return a removed item's box to the free space. Merging it with face
+    neighbours alone leaves space fragmented when no neighbour shares a whole
+    face, so the free space of the region around it (the bounding box of the
+    freed box and every free space touching it) is derived again from the
+    placements inside the region.
+    """
+    x, y, z = pos
+    w, d, h = orient
+    box = (x, y, z, x + w, y + h, z + d)
+    region = box
+    for fs in self.free_space_index.touching(box):
+      bounds = fs.get_bounds()
+      region = tuple(min(region[i], bounds[i]) for i in range(3)) + tuple(max(region[i], bounds[i]) for i in range(3, 6))
+    rx1, ry1, rz1, rx2, ry2, rz2 = region
+
+    inside = [FreeSpace(rx1, ry1, rz1, rx2 - rx1, ry2 - ry1, rz2 - rz1)]
+    for _, (px, py, pz), (pw, pd, ph) in self.items_in_box((rx1, ry1, rz1), (rx2 - rx1, rz2 - rz1, ry2 - ry1)):
+      placed = (px, py, pz, px + pw, py + ph, pz + pd)
+      inside = [piece for fs in inside for piece in trim_free_space(fs, placed, self.maximal_spaces)]
+      if self.maximal_spaces:
+        inside = prune_dominated(inside, [])
+
+    if self.maximal_spaces:
+      # Maximal spaces may overlap, so spaces reaching into the region stay;
+      # the ones inside it are replaced by its new spaces
+      neighbours = []
+      for fs in self.free_space_index.touching(region):
+        if contains(region, fs.get_bounds()):
+          self.remove_free_space(fs)
+        else:
+          neighbours.append(fs)
+      for fs in prune_dominated(inside, neighbours):
+        self.add_free_space(fs)
+      return
+
+    # Guillotine spaces are disjoint: keep only the parts outside the region
+    new_spaces = list(inside)
+    for fs in self.free_space_index.touching(region):
+      pieces = trim_free_space(fs, region)
+      if len(pieces) == 1 and pieces[0] is fs:
+        continue
+      self.remove_free_space(fs)
+      new_spaces.extend(pieces)
+    for fs in new_spaces:
+      self.add_free_space(fs)
+    self.merge_free_spaces(new_spaces)
+
+  def place_at(self, item, pos, orient):
+    # Places item in a box known to be empty, trimming the free space it takes
+    self.add_placement(item, pos, orient)
+    self.update_free_spaces_with_trim(item, pos, orient)
 
   def place_item(self, item):
-    self.free_spaces.sort(key=lambda fs: (fs.z, fs.y, fs.x))
-    valid_orientations = sorted(get_orientations(item), key=lambda o: (o[0], o[2], o[1]))
-    for fs in self.free_spaces:
-      for orient in valid_orientations:
-        if fs.fits(orient):
-          pos = (fs.x, fs.y, fs.z)
-          self.add_placement(item, pos, orient)
-          self.update_free_spaces_with_trim(item, pos, orient)
-          return True
-    return False
+    if self.counters is not None:
+      return self.timed("place_item", self._place_item, item)
+    return self._place_item(item)
+
+  def _place_item(self, item):
+    valid_orientations = orientation_table(item.shape, self.orientation_policy)
+    match = self.free_space_index.find_first(valid_orientations)
+    if match is None:
+      return False
+    fs, orient = match
+    self.place_at(item, (fs.x, fs.y, fs.z), orient)
+    return True
+
+  def place_batch(self, items):
+    if self.counters is not None:
+      return self.timed("place_batch", self._place_batch, items)
+    return self._place_batch(items)
+
+  def _place_batch(self, items):
+    # Places a run of identically shaped items as grids filling whole free
+    # spaces, trimming once per grid. Returns how many leading items were placed.
+    if not items:
+      return 0
+    shape = items[0].shape
+    if any(item.shape != shape for item in items):
+      raise ValueError("place_batch expects items of identical shape")
+    valid_orientations = orientation_table(shape, self.orientation_policy)
+    placed = 0
+    while placed < len(items):
+      match = self.free_space_index.find_first(valid_orientations)
+      if match is None:
+        break
+      fs, orient = match
+      iw, id_, ih = orient
+      # Grid coordinates are accumulated the same way item-by-item trimming would
+      xs = grid_coords(fs.x, iw, fs.x + fs.width)
+      ys = grid_coords(fs.y, ih, fs.y + fs.height)
+      zs = grid_coords(fs.z, id_, fs.z + fs.depth)
+      nx, ny = len(xs) - 1, len(ys) - 1
+      count = min(len(items) - placed, nx * ny * (len(zs) - 1))
+      self.add_placements(items[placed:placed + count], grid_columns(xs, ys, zs, orient, count))
+      placed += count
+      # Filled region as at most three boxes: full layers, full rows, partial row
+      kz, rest = divmod(count, nx * ny)
+      ky, kx = divmod(rest, nx)
+      if kz:
+        self.trim_placed_box((xs[0], ys[0], zs[0], xs[nx], ys[ny], zs[kz]))
+      if ky:
+        self.trim_placed_box((xs[0], ys[0], zs[kz], xs[nx], ys[ky], zs[kz + 1]))
+      if kx:
+        self.trim_placed_box((xs[0], ys[ky], zs[kz], xs[kx], ys[ky + 1], zs[kz + 1]))
+    return placed
@@ -0,0 +1,62 @@
+from .FreeSpace import TOL
+
+
+def _q(value):
+  # Snap to the tolerance grid so near-equal coordinates hash together
+  return round(value / TOL)
+
+
+def _face_keys(fs):
+  x, y, z = _q(fs.x), _q(fs.y), _q(fs.z)
+  w, h, d = _q(fs.width), _q(fs.height), _q(fs.depth)
+  x2, y2, z2 = _q(fs.x + fs.width), _q(fs.y + fs.height), _q(fs.z + fs.depth)
+  starts = (("x", y, z, h, d, x), ("y", x, z, w, d, y), ("z", x, y, w, h, z))
+  ends = (("x", y, z, h, d, x2), ("y", x, z, w, d, y2), ("z", x, y, w, h, z2))
+  return starts, ends
+
+
+class FaceIndex:
+  """
+  Hashes the start and end face planes of each free space along every axis.
+  Two spaces can merge along an axis exactly when one's end key equals the
+  other's start key, e.g. (y, z, height, depth, x_end) for x-axis merges.
+  """
+
+  def __init__(self, spaces=()):
+    self._starts = {}
+    self._ends = {}
+    self._keys = {}
+    for fs in spaces:
+      self.add(fs)
+
+  def add(self, fs):
+    starts, ends = _face_keys(fs)
+    self._keys[fs] = (starts, ends)
+    for key in starts:
+      self._starts[key] = fs
+    for key in ends:
+      self._ends[key] = fs
+
+  def discard(self, fs):
+    keys = self._keys.pop(fs, None)
+    if keys is None:
+      return
+    starts, ends = keys
+    for key in starts:
+      if self._starts.get(key) is fs:
+        del self._starts[key]
+    for key in ends:
+      if self._ends.get(key) is fs:
+        del self._ends[key]
+
+  def find_neighbour(self, fs):
+    # Same axis order as try_merge: x, then y, then z
+    starts, ends = self._keys[fs]
+    for start_key, end_key in zip(starts, ends):
+      other = self._starts.get(end_key)
+      if other is not None and other is not fs:
+        return other
+      other = self._ends.get(start_key)
+      if other is not None and other is not fs:
+        return other
+    return None
@@ -5,6 +5,8 @@ TOL = 1e-6
 
 
 class FreeSpace:
+  __slots__ = ("x", "y", "z", "width", "height", "depth", "source")
+
   def __init__(self, x, y, z, width, height, depth, source=None):
     self.x = x
     self.y = y
@@ -29,6 +31,13 @@ class FreeSpace:
             f"w={self.width:.2f}, h={self.height:.2f}, d={self.depth:.2f}{src})")
 
 
+def contains(outer, inner):
+  ox1, oy1, oz1, ox2, oy2, oz2 = outer
+  ix1, iy1, iz1, ix2, iy2, iz2 = inner
+  return (ox1 <= ix1 + TOL and oy1 <= iy1 + TOL and oz1 <= iz1 + TOL and
+          ox2 >= ix2 - TOL and oy2 >= iy2 - TOL and oz2 >= iz2 - TOL)
+
+
 def try_merge(fs1, fs2):
   # Check for merge along x-axis
   if abs(fs1.y - fs2.y) < TOL and abs(fs1.z - fs2.z) < TOL and abs(fs1.height - fs2.height) < TOL and abs(fs1.depth - fs2.depth) < TOL:
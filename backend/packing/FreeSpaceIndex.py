@@ -0,0 +1,234 @@
+import random
+from .FreeSpace import TOL
+
+
+class _Node:
+  __slots__ = ("key", "space", "prio", "left", "right", "max_w", "max_h", "max_d", "space_bounds", "bounds")
+
+  def __init__(self, key, space, prio):
+    self.key = key
+    self.space = space
+    self.prio = prio
+    self.left = None
+    self.right = None
+    self.max_w = space.width
+    self.max_h = space.height
+    self.max_d = space.depth
+    self.space_bounds = space.get_bounds()
+    self.bounds = self.space_bounds
+
+
+def _update(node):
+  fs = node.space
+  max_w, max_h, max_d = fs.width, fs.height, fs.depth
+  x1, y1, z1, x2, y2, z2 = node.space_bounds
+  for child in (node.left, node.right):
+    if child is not None:
+      if child.max_w > max_w:
+        max_w = child.max_w
+      if child.max_h > max_h:
+        max_h = child.max_h
+      if child.max_d > max_d:
+        max_d = child.max_d
+      cx1, cy1, cz1, cx2, cy2, cz2 = child.bounds
+      if cx1 < x1:
+        x1 = cx1
+      if cy1 < y1:
+        y1 = cy1
+      if cz1 < z1:
+        z1 = cz1
+      if cx2 > x2:
+        x2 = cx2
+      if cy2 > y2:
+        y2 = cy2
+      if cz2 > z2:
+        z2 = cz2
+  node.max_w, node.max_h, node.max_d = max_w, max_h, max_d
+  # Bounding box of every space in the subtree
+  node.bounds = (x1, y1, z1, x2, y2, z2)
+
+
+def _split(node, key):
+  # Returns (nodes with key < key, nodes with key >= key)
+  if node is None:
+    return None, None
+  if node.key < key:
+    left, right = _split(node.right, key)
+    node.right = left
+    _update(node)
+    return node, right
+  left, right = _split(node.left, key)
+  node.left = right
+  _update(node)
+  return left, node
+
+
+def _join(left, right):
+  if left is None:
+    return right
+  if right is None:
+    return left
+  if left.prio > right.prio:
+    left.right = _join(left.right, right)
+    _update(left)
+    return left
+  right.left = _join(left, right.left)
+  _update(right)
+  return right
+
+
+def _delete(node, key):
+  if node is None:
+    return None
+  if key == node.key:
+    return _join(node.left, node.right)
+  if key < node.key:
+    node.left = _delete(node.left, key)
+  else:
+    node.right = _delete(node.right, key)
+  _update(node)
+  return node
+
+
+def _can_fit_any(node, orientations):
+  for w, d, h in orientations:
+    if w <= node.max_w + TOL and d <= node.max_d + TOL and h <= node.max_h + TOL:
+      return True
+  return False
+
+
+def _intersects(a, b):
+  return not (a[0] > b[3] + TOL or a[3] < b[0] - TOL or
+              a[1] > b[4] + TOL or a[4] < b[1] - TOL or
+              a[2] > b[5] + TOL or a[5] < b[2] - TOL)
+
+
+class FreeSpaceIndex:
+  """
+  Ordered set of free spaces keyed by corner position (z, y, x).
+  Ties are broken by insertion order, matching a stable sort of the list the
+  spaces were inserted from. Every subtree tracks its largest width, height
+  and depth so fit queries skip subtrees that cannot hold the item, and its
+  bounding box so neighbourhood queries skip subtrees far from a region.
+  """
+
+  def __init__(self, spaces=()):
+    self._rng = random.Random(0)
+    self._root = None
+    self._keys = {}
+    self._seq = 0
+    self._volume = 0
+    self.rebuild(spaces)
+
+  def __len__(self):
+    return len(self._keys)
+
+  def __contains__(self, fs):
+    return fs in self._keys
+
+  def __iter__(self):
+    stack = []
+    node = self._root
+    while stack or node is not None:
+      while node is not None:
+        stack.append(node)
+        node = node.left
+      node = stack.pop()
+      yield node.space
+      node = node.right
+
+  def _next_key(self, fs):
+    key = (fs.z, fs.y, fs.x, self._seq)
+    self._seq += 1
+    self._keys[fs] = key
+    return key
+
+  def summary(self):
+    # Total free volume (an upper bound when spaces overlap) and the largest
+    # width, height and depth of any space
+    if self._root is None:
+      return 0, (0, 0, 0)
+    return self._volume, (self._root.max_w, self._root.max_h, self._root.max_d)
+
+  def rebuild(self, spaces):
+    self._root = None
+    self._keys = {}
+    self._seq = 0
+    self._volume = 0
+    nodes = sorted((_Node(self._next_key(fs), fs, self._rng.random()) for fs in spaces), key=lambda n: n.key)
+    self._volume = sum(fs.width * fs.height * fs.depth for fs in spaces)
+    # Linear-time treap construction from sorted keys (Cartesian tree)
+    stack = []
+    for node in nodes:
+      last = None
+      while stack and stack[-1].prio < node.prio:
+        last = stack.pop()
+        _update(last)
+      node.left = last
+      if stack:
+        stack[-1].right = node
+      stack.append(node)
+    self._root = stack[0] if stack else None
+    while stack:
+      _update(stack.pop())
+
+  def insert(self, fs, key=None):
+    # key is only given when putting back a space removed with its key
+    if key is None:
+      key = self._next_key(fs)
+    else:
+      self._keys[fs] = key
+    node = _Node(key, fs, self._rng.random())
+    left, right = _split(self._root, node.key)
+    self._root = _join(_join(left, node), right)
+    self._volume += fs.width * fs.height * fs.depth
+
+  def remove(self, fs):
+    # Returns the space's key (truthy), or None if it was not in the index
+    key = self._keys.pop(fs, None)
+    if key is None:
+      return None
+    self._root = _delete(self._root, key)
+    self._volume -= fs.width * fs.height * fs.depth
+    return key
+
+  def find_first(self, orientations):
+    """
+    Return (space, orientation) for the first space in (z, y, x) order that
+    fits any of the orientations, trying orientations in the given order.
+    Returns None if no space fits.
+    """
+    stack = []
+    node = self._root
+    while stack or node is not None:
+      while node is not None and _can_fit_any(node, orientations):
+        stack.append(node)
+        node = node.left
+      if not stack:
+        return None
+      node = stack.pop()
+      for orient in orientations:
+        if node.space.fits(orient):
+          return node.space, orient
+      node = node.right
+    return None
+
+  def touching(self, bounds):
+    """
+    Return the spaces whose closed box intersects the given
+    (x1, y1, z1, x2, y2, z2) bounds, in (z, y, x) order.
+    """
+    result = []
+    stack = []
+    node = self._root
+    while stack or node is not None:
+      while node is not None and _intersects(node.bounds, bounds):
+        stack.append(node)
+        node = node.left
+      if not stack:
+        break
+      node = stack.pop()
+      if _intersects(node.space_bounds, bounds):
+        result.append(node.space)
+      node = node.right
+    return result
@@ -1,18 +1,40 @@
+import sys
 from datetime import datetime, MAXYEAR
+from functools import lru_cache
+
+NO_EXPIRY = datetime(MAXYEAR, 12, 31)
+
+
+@lru_cache(maxsize=4096)
+def parse_expiry(value):
+  # Manifests reuse a few hundred dates, so each distinct string is parsed once
+  if value == "N/A" or value is None:
+    return NO_EXPIRY
+  return datetime.strptime(value, '%Y-%m-%d')
+
+
+def intern_text(value):
+  # Names and zones repeat across thousands of items; share one copy of each
+  return sys.intern(value) if type(value) is str else value
 
 
 class Item:
+  __slots__ = ("id", "name", "width", "depth", "height", "shape", "mass_kg", "priority", "expiry",
+               "usage_limit", "preferred_zone")
+
   def __init__(self, item_id, name, width, depth, height, mass_kg, priority, expiry, usage_limit, preferred_zone):
     self.id = item_id
-    self.name = name
+    self.name = intern_text(name)
     self.width = width
     self.depth = depth
     self.height = height
+    # Shape key shared by items with identical dimensions (see orientation_table)
+    self.shape = (width, depth, height)
     self.mass_kg = mass_kg
     self.priority = priority
-    self.expiry = datetime(MAXYEAR, 12, 31) if expiry == "N/A" else datetime.strptime(expiry, '%Y-%m-%d')
+    self.expiry = expiry if isinstance(expiry, datetime) else parse_expiry(expiry)
     self.usage_limit = usage_limit
-    self.preferred_zone = preferred_zone
+    self.preferred_zone = intern_text(preferred_zone)
 
   def __repr__(self):
     return f"Item({self.id}, P:{self.priority})"
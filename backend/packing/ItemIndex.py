@@ -0,0 +1,110 @@
+from bisect import bisect_left, insort
+from .Item import NO_EXPIRY
+
+
+class ItemIndex:
+  """
+  Hash indexes over placed items: item id -> container (the placement slot
+  comes from the container's PlacementTable) and name -> item ids, in the
+  order they were placed. It also keeps the waste indexes: (expiry, id)
+  pairs sorted by date for items that can expire, and the set of items with
+  no uses left. Callers update it on place, remove, use and undock.
+  """
+
+  def __init__(self, containers=()):
+    self.entries = {}   # item id -> (container, name, expiry)
+    self.names = {}     # name -> {item id: None}, an insertion-ordered set
+    self.expiries = []  # sorted (expiry, item id), items that never expire are left out
+    self.depleted = {}  # item id -> None for items with usage_limit <= 0
+    self.add_containers(containers)
+
+  def __len__(self):
+    return len(self.entries)
+
+  def __contains__(self, item_id):
+    return item_id in self.entries
+
+  def add(self, container, item):
+    if self._add(container, item):
+      insort(self.expiries, (item.expiry, item.id))
+
+  def add_container(self, container):
+    self.add_containers([container])
+
+  def add_containers(self, containers):
+    # One sort for all their items instead of an insort per item
+    new = [(item.expiry, item.id) for container in containers
+           for item in container.placements.items if self._add(container, item)]
+    if new:
+      self.expiries.extend(new)
+      self.expiries.sort()
+
+  def _add(self, container, item):
+    # Indexes everything but the expiry; True if the item can expire
+    if item.id in self.entries:
+      self.discard(item.id)
+    self.entries[item.id] = (container, item.name, item.expiry)
+    self.names.setdefault(item.name, {})[item.id] = None
+    self.note_use(item)
+    return item.expiry != NO_EXPIRY
+
+  def note_use(self, item):
+    # Call after changing an indexed item's usage_limit
+    if item.usage_limit <= 0 and item.id in self.entries:
+      self.depleted[item.id] = None
+
+  def discard(self, item_id):
+    # Returns the container the item was indexed in, or None
+    container, name, expiry = self.entries.pop(item_id, (None, None, None))
+    if container is None:
+      return None
+    ids = self.names[name]
+    del ids[item_id]
+    if not ids:
+      del self.names[name]
+    if expiry != NO_EXPIRY:
+      del self.expiries[bisect_left(self.expiries, (expiry, item_id))]
+    self.depleted.pop(item_id, None)
+    return container
+
+  def discard_container(self, container):
+    for item in container.placements.items:
+      if self.container_of(item.id) is container:
+        self.discard(item.id)
+
+  def container_of(self, item_id):
+    entry = self.entries.get(item_id)
+    return entry[0] if entry is not None else None
+
+  def find(self, item_id):
+    # (container, slot) of the item's placement, or None
+    entry = self.entries.get(item_id)
+    if entry is None:
+      return None
+    return entry[0], entry[0].placements.slot(item_id)
+
+  def item(self, item_id):
+    # The placed Item, or None
+    found = self.find(item_id)
+    return found[0].placements.items[found[1]] if found is not None else None
+
+  def find_name(self, name):
+    # (container, slot) of the first placed item with this name, or None
+    for item_id in self.names.get(name, ()):
+      return self.find(item_id)
+    return None
+
+  def ids_named(self, name):
+    return list(self.names.get(name, ()))
+
+  def waste(self, now):
+    """
+    (item id, reason) for every item that expired before now, soonest
+    first, then every other item with no uses left. Costs a bisect plus
+    the number of waste items.
+    """
+    expired = self.expiries[:bisect_left(self.expiries, (now,))]
+    waste = [(item_id, "Expired") for _, item_id in expired]
+    expired_ids = {item_id for _, item_id in expired}
+    waste.extend((item_id, "Out of Uses") for item_id in self.depleted if item_id not in expired_ids)
+    return waste
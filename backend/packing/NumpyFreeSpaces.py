@@ -0,0 +1,273 @@
+from functools import lru_cache
+from .FreeSpace import FreeSpace, TOL
+
+try:
+  import numpy as np
+except ImportError:  # numpy is optional, only this backend needs it
+  np = None
+
+X, Y, Z, W, H, D = range(6)
+
+
+@lru_cache(maxsize=4096)
+def _orientation_array(orientations):
+  # Orientation tables are cached tuples, so this converts each shape once
+  return np.array(orientations, dtype=float)
+
+
+class NumpyFreeSpaces:
+  """
+  Struct-of-arrays free-space store: one contiguous float64 array per
+  coordinate (x, y, z, w, h, d) plus a liveness mask and an insertion
+  sequence. Fit tests run for every space and orientation in one vectorized
+  call, and a placement trims every overlapped space in bulk.
+
+  Iteration order, split order and merge order follow FreeSpaceIndex and
+  FaceIndex, so both backends produce the same placements.
+  """
+
+  def __init__(self, spaces=()):
+    if np is None:
+      raise ImportError("The numpy free-space backend requires numpy to be installed")
+    self.rebuild(spaces)
+
+  def __len__(self):
+    return self._count
+
+  def __contains__(self, fs):
+    return self._find_row(fs) is not None
+
+  def __iter__(self):
+    for row in self._ordered(np.flatnonzero(self._alive[:self._size])):
+      yield self._space(row)
+
+  def summary(self):
+    if self._summary is None:
+      n = self._size
+      alive = self._alive[:n]
+      w, h, d = self._data[W, :n][alive], self._data[H, :n][alive], self._data[D, :n][alive]
+      if w.size:
+        self._summary = float((w * h * d).sum()), (float(w.max()), float(h.max()), float(d.max()))
+      else:
+        self._summary = 0, (0, 0, 0)
+    return self._summary
+
+  def rebuild(self, spaces):
+    spaces = list(spaces)
+    capacity = max(16, 2 * len(spaces))
+    self._data = np.zeros((6, capacity))
+    self._quant = np.zeros((9, capacity))
+    self._seq = np.zeros(capacity, dtype=np.int64)
+    self._alive = np.zeros(capacity, dtype=bool)
+    self._size = 0
+    self._count = 0
+    self._next_seq = 0
+    self._summary = None
+    self.last_trim = (0, 0)  # (spaces split, splits made) by the last trim
+    if spaces:
+      self._append(np.array([[fs.x, fs.y, fs.z, fs.width, fs.height, fs.depth] for fs in spaces]).T)
+
+  def insert(self, fs):
+    self._append(np.array([[fs.x], [fs.y], [fs.z], [fs.width], [fs.height], [fs.depth]]))
+
+  def remove(self, fs):
+    row = self._find_row(fs)
+    if row is None:
+      return False
+    self._kill(np.array([row]))
+    return True
+
+  def find_first(self, orientations):
+    n = self._size
+    w, h, d = self._data[W, :n, None], self._data[H, :n, None], self._data[D, :n, None]
+    orients = _orientation_array(tuple(orientations))
+    fits = ((orients[:, 0] <= w + TOL) & (orients[:, 1] <= d + TOL) & (orients[:, 2] <= h + TOL) &
+            self._alive[:n, None])
+    rows = np.flatnonzero(fits.any(axis=1))
+    if rows.size == 0:
+      return None
+    row = self._ordered(rows)[0]
+    return self._space(row), orientations[int(np.argmax(fits[row]))]
+
+  def touching(self, bounds):
+    qx1, qy1, qz1, qx2, qy2, qz2 = bounds
+    x1, y1, z1, x2, y2, z2 = self._bounds()
+    mask = self._alive[:self._size] & ~(
+        (x1 > qx2 + TOL) | (x2 < qx1 - TOL) | (y1 > qy2 + TOL) |
+        (y2 < qy1 - TOL) | (z1 > qz2 + TOL) | (z2 < qz1 - TOL))
+    return [self._space(row) for row in self._ordered(np.flatnonzero(mask))]
+
+  def trim(self, placed_bounds, maximal=False):
+    """
+    Split every space overlapping placed_bounds, then merge (guillotine
+    mode) or drop dominated splits (maximal mode).
+    Returns the space count before and after that last step.
+    """
+    if self._size > 2 * self._count + 64:
+      self._compact()
+    px1, py1, pz1, px2, py2, pz2 = placed_bounds
+    x1, y1, z1, x2, y2, z2 = self._bounds()
+    alive = self._alive[:self._size]
+    separate = ((px2 <= x1 + TOL) | (px1 >= x2 - TOL) | (py2 <= y1 + TOL) |
+                (py1 >= y2 - TOL) | (pz2 <= z1 + TOL) | (pz1 >= z2 - TOL))
+    parents = self._ordered(np.flatnonzero(alive & ~separate))
+    if maximal:
+      touching = alive & separate & ~(
+          (x1 > px2 + TOL) | (x2 < px1 - TOL) | (y1 > py2 + TOL) |
+          (y2 < py1 - TOL) | (z1 > pz2 + TOL) | (z2 < pz1 - TOL))
+      neighbours = np.stack((x1, y1, z1, x2, y2, z2))[:, touching]
+    children = self._split(parents, placed_bounds, maximal)
+    self.last_trim = (len(parents), children.shape[1])
+    self._kill(parents)
+    before = self._count + children.shape[1]
+    if maximal:
+      self._append(self._prune_dominated(children, neighbours))
+      return before, self._count
+    self._merge(list(self._append(children)))
+    return before, self._count
+
+  def merge(self, spaces=None):
+    if spaces is None:
+      self._merge(list(self._ordered(np.flatnonzero(self._alive[:self._size]))))
+      return
+    rows = (self._find_row(fs) for fs in spaces)
+    self._merge([row for row in rows if row is not None])
+
+  def _split(self, rows, placed_bounds, maximal):
+    px1, py1, pz1, px2, py2, pz2 = placed_bounds
+    x, y, z, w, h, d = self._data[:, rows]
+    x2, y2, z2 = x + w, y + h, z + d
+    if maximal:
+      splits = [
+          (px1 > x + TOL, (x, y, z, px1 - x, h, d)),
+          (px2 < x2 - TOL, (np.full_like(x, px2), y, z, x2 - px2, h, d)),
+          (py1 > y + TOL, (x, y, z, w, py1 - y, d)),
+          (py2 < y2 - TOL, (x, np.full_like(y, py2), z, w, y2 - py2, d)),
+          (pz1 > z + TOL, (x, y, z, w, h, pz1 - z)),
+          (pz2 < z2 - TOL, (x, y, np.full_like(z, pz2), w, h, z2 - pz2)),
+      ]
+    else:
+      ix1, ix2 = np.maximum(x, px1), np.minimum(x2, px2)
+      iy1, iy2 = np.maximum(y, py1), np.minimum(y2, py2)
+      splits = [
+          (px1 > x + TOL, (x, y, z, px1 - x, h, d)),
+          (px2 < x2 - TOL, (np.full_like(x, px2), y, z, x2 - px2, h, d)),
+          (py1 > y + TOL, (ix1, y, z, ix2 - ix1, py1 - y, d)),
+          (py2 < y2 - TOL, (ix1, np.full_like(y, py2), z, ix2 - ix1, y2 - py2, d)),
+          (pz1 > z + TOL, (ix1, iy1, z, ix2 - ix1, iy2 - iy1, pz1 - z)),
+          (pz2 < z2 - TOL, (ix1, iy1, np.full_like(z, pz2), ix2 - ix1, iy2 - iy1, z2 - pz2)),
+      ]
+    # (field, parent, split) flattened parent-major, as trim_free_space emits them
+    children = np.stack([np.stack(fields) for _, fields in splits], axis=2).reshape(6, -1)
+    valid = np.stack([cond for cond, _ in splits], axis=1).reshape(-1)
+    valid &= (children[W] > TOL) & (children[H] > TOL) & (children[D] > TOL)
+    return children[:, valid]
+
+  def _prune_dominated(self, children, neighbours):
+    # Same rule as prune_dominated: largest first, dropped if inside a
+    # neighbour or inside any larger (or equal, earlier) split
+    order = np.argsort(-(children[W] * children[H] * children[D]), kind="stable")
+    children = children[:, order]
+    lo, hi = children[:3], children[:3] + children[3:]
+    inside_neighbour = np.zeros(children.shape[1], dtype=bool)
+    if neighbours.shape[1]:
+      inside_neighbour = ((neighbours[:3, None, :] <= lo[:, :, None] + TOL).all(axis=0) &
+                          (neighbours[3:, None, :] >= hi[:, :, None] - TOL).all(axis=0)).any(axis=1)
+    inside_split = ((lo[:, None, :] <= lo[:, :, None] + TOL).all(axis=0) &
+                    (hi[:, None, :] >= hi[:, :, None] - TOL).all(axis=0))
+    inside_earlier = np.tril(inside_split, k=-1).any(axis=1)
+    return children[:, ~(inside_neighbour | inside_earlier)]
+
+  def _merge(self, pending):
+    while pending:
+      row = pending.pop()
+      if not self._alive[row]:
+        continue
+      match = self._find_neighbour(row)
+      if match is None:
+        continue
+      other, axis, after = match
+      first, second = (row, other) if after else (other, row)
+      merged = self._data[:, first].copy()
+      merged[W + axis] = self._data[W + axis, first] + self._data[W + axis, second]
+      self._kill(np.array([row, other]))
+      pending.extend(self._append(merged[:, None]))
+
+  def _find_neighbour(self, row):
+    # Mirrors FaceIndex.find_neighbour: per axis x, y, z, first the space
+    # starting at this one's end face, then the one ending at its start face
+    n = self._size
+    q = self._quant[:, :n]
+    qr = self._quant[:, row]
+    alive = self._alive[:n].copy()
+    alive[row] = False
+    for axis in range(3):
+      others = [a for a in range(3) if a != axis]
+      same = alive.copy()
+      for a in others:
+        same &= (q[a] == qr[a]) & (q[3 + a] == qr[3 + a])
+      for after, start, end in ((True, axis, 6 + axis), (False, 6 + axis, axis)):
+        rows = np.flatnonzero(same & (q[start] == qr[end]))
+        if rows.size:
+          return int(self._ordered(rows)[-1]), axis, after
+    return None
+
+  def _append(self, columns):
+    k = columns.shape[1]
+    if self._size + k > self._data.shape[1]:
+      self._grow(self._size + k)
+    rows = np.arange(self._size, self._size + k)
+    self._data[:, rows] = columns
+    ends = columns[:3] + columns[3:]
+    self._quant[:6, rows] = np.round(columns / TOL)
+    self._quant[6:, rows] = np.round(ends / TOL)
+    self._seq[rows] = np.arange(self._next_seq, self._next_seq + k)
+    self._alive[rows] = True
+    self._size += k
+    self._count += k
+    self._next_seq += k
+    self._summary = None
+    return rows
+
+  def _kill(self, rows):
+    self._alive[rows] = False
+    self._count -= len(rows)
+    self._summary = None
+
+  def _grow(self, needed):
+    capacity = max(16, 2 * needed)
+    self._data = np.concatenate((self._data, np.zeros((6, capacity - self._data.shape[1]))), axis=1)
+    self._quant = np.concatenate((self._quant, np.zeros((9, capacity - self._quant.shape[1]))), axis=1)
+    self._seq = np.concatenate((self._seq, np.zeros(capacity - len(self._seq), dtype=np.int64)))
+    self._alive = np.concatenate((self._alive, np.zeros(capacity - len(self._alive), dtype=bool)))
+
+  def _compact(self):
+    # Drop dead rows, keeping insertion sequence; row ids change, so this
+    # only runs between placements
+    alive = np.flatnonzero(self._alive[:self._size])
+    k = len(alive)
+    self._data[:, :k] = self._data[:, alive]
+    self._quant[:, :k] = self._quant[:, alive]
+    self._seq[:k] = self._seq[alive]
+    self._alive[:k] = True
+    self._alive[k:self._size] = False
+    self._size = k
+
+  def _bounds(self):
+    x, y, z, w, h, d = self._data[:, :self._size]
+    return x, y, z, x + w, y + h, z + d
+
+  def _ordered(self, rows):
+    # (z, y, x) corner order, ties by insertion sequence
+    x, y, z = self._data[X, rows], self._data[Y, rows], self._data[Z, rows]
+    return rows[np.lexsort((self._seq[rows], x, y, z))]
+
+  def _find_row(self, fs):
+    n = self._size
+    x, y, z, w, h, d = self._data[:, :n]
+    rows = np.flatnonzero(self._alive[:n] & (x == fs.x) & (y == fs.y) & (z == fs.z) &
+                          (w == fs.width) & (h == fs.height) & (d == fs.depth))
+    return int(rows[0]) if rows.size else None
+
+  def _space(self, row):
+    return FreeSpace(*self._data[:, row].tolist())
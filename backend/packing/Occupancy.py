@@ -0,0 +1,105 @@
+from bisect import bisect_left, bisect_right, insort
+from itertools import count
+from math import floor
+from .FreeSpace import TOL
+
+
+class OccupancyMap:
+  """
+  Depth map of the container's open face. The (x, y) face is quantized into
+  columns; each column keeps the placements covering it sorted by their
+  back face z. The open face is at z = depth, so "in front of" means larger z.
+  """
+
+  def __init__(self, width, height, depth, cells=32):
+    self.width = width
+    self.height = height
+    self.depth = depth
+    self.cells = cells
+    self.nx = max(1, min(cells, int(width)))
+    self.ny = max(1, min(cells, int(height)))
+    self.cell_w = width / self.nx
+    self.cell_h = height / self.ny
+    self._columns = {}
+    self._entries = {}
+    self._uid = count()
+
+  def __len__(self):
+    return len(self._entries)
+
+  def _column_range(self, x1, y1, x2, y2):
+    # Columns overlapped by the open interior of the footprint
+    i1 = max(0, floor((x1 + TOL) / self.cell_w))
+    i2 = min(self.nx - 1, floor((x2 - TOL) / self.cell_w))
+    j1 = max(0, floor((y1 + TOL) / self.cell_h))
+    j2 = min(self.ny - 1, floor((y2 - TOL) / self.cell_h))
+    return [(i, j) for i in range(i1, i2 + 1) for j in range(j1, j2 + 1)]
+
+  def add(self, item, pos, orient):
+    x, y, z = pos
+    w, d, h = orient
+    entry = (z, z + d, next(self._uid), (x, y, x + w, y + h), (item, pos, orient))
+    columns = self._column_range(x, y, x + w, y + h)
+    for column in columns:
+      insort(self._columns.setdefault(column, []), entry)
+    self._entries[item.id] = (entry, columns)
+
+  def remove(self, item_id):
+    entry, columns = self._entries.pop(item_id, (None, None))
+    if entry is None:
+      return False
+    for column in columns:
+      stack = self._columns[column]
+      del stack[bisect_left(stack, entry)]
+    return True
+
+  def items_in_front(self, pos, orient):
+    """
+    Placements overlapping the footprint of the given box whose back face is
+    at or beyond its front face, nearest the open face first (removal order).
+    """
+    x, y, z = pos
+    w, d, h = orient
+    front = z + d
+    found = {}
+    for column in self._column_range(x, y, x + w, y + h):
+      stack = self._columns.get(column, [])
+      for entry in stack[bisect_left(stack, (front - TOL,)):]:
+        ex1, ey1, ex2, ey2 = entry[3]
+        if ex1 < x + w - TOL and ex2 > x + TOL and ey1 < y + h - TOL and ey2 > y + TOL:
+          found[entry[2]] = entry
+    return [entry[4] for entry in sorted(found.values(), key=lambda e: (-e[0], e[2]))]
+
+  def items_in_box(self, pos, orient, limit=None):
+    """
+    Placements overlapping the interior of the given box, in placement
+    order; None as soon as more than limit are found.
+    """
+    x, y, z = pos
+    w, d, h = orient
+    found = {}
+    for column in self._column_range(x, y, x + w, y + h):
+      stack = self._columns.get(column, [])
+      for entry in stack[:bisect_left(stack, (z + d - TOL,))]:
+        if entry[1] <= z + TOL or entry[2] in found:
+          continue
+        ex1, ey1, ex2, ey2 = entry[3]
+        if ex1 < x + w - TOL and ex2 > x + TOL and ey1 < y + h - TOL and ey2 > y + TOL:
+          found[entry[2]] = entry
+          if limit is not None and len(found) > limit:
+            return None
+    return [found[uid][4] for uid in sorted(found)]
+
+  def occupant(self, x, y, z):
+    # Placement whose half-open box [start, end) contains the point, or None
+    i = min(self.nx - 1, max(0, floor((x + TOL) / self.cell_w)))
+    j = min(self.ny - 1, max(0, floor((y + TOL) / self.cell_h)))
+    stack = self._columns.get((i, j), [])
+    for entry in reversed(stack[:bisect_right(stack, (z + TOL, float("inf")))]):
+      ex1, ey1, ex2, ey2 = entry[3]
+      if z < entry[1] - TOL and ex1 <= x + TOL and x < ex2 - TOL and ey1 <= y + TOL and y < ey2 - TOL:
+        return entry[4]
+    return None
+
+  def is_free(self, x, y, z):
+    return self.occupant(x, y, z) is None
@@ -1 +1,3 @@
-from . import packing_test
+from .packing_test import main
+
+main()
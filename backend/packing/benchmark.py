@@ -0,0 +1,150 @@
+"""
+Packing benchmark over the visualizer datasets and the sample manifest.
+
+  python -m packing.benchmark                    # run, compare with the baseline
+  python -m packing.benchmark --write-baseline   # store this run as the baseline
+  python -m packing.benchmark 65stairs csv       # only datasets matching a name
+
+Each dataset records items/sec (best of --repeat runs), peak traced memory,
+peak free-space count and volume fill. Throughput depends on the machine, so
+the baseline should be refreshed on the machine the comparison runs on;
+placed counts and fill are deterministic and must match exactly unless the
+packing itself was meant to change.
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from .packing import pack_items
+from .packing_test import parse_from_csvs, parse_from_json, SAMPLES_DIR, DATASETS_DIR
+
+BASELINE_FILE = Path(__file__).with_name("benchmark_baseline.json")
+RESULTS_FILE = Path(__file__).with_name("benchmark_results.json")
+THROUGHPUT_TOLERANCE = 0.2  # Slowdowns within 20% of the baseline are noise
+MIN_TIMED_SECONDS = 0.01  # Faster runs are too short to compare throughput
+
+
+def datasets():
+  # name -> loader returning fresh (items, containers); output.json is written
+  # by packing_test, so it is not an input
+  found = {"csv": lambda **kw: parse_from_csvs(SAMPLES_DIR / "input_items.csv",
+                                               SAMPLES_DIR / "containers.csv", **kw)}
+  for path in sorted(DATASETS_DIR.glob("*.json")):
+    if path.stem != "output":
+      found[path.stem] = lambda path=path, **kw: parse_from_json(path, **kw)
+  return found
+
+
+def fill_ratio(containers):
+  container_volume = sum(c.width * c.height * c.depth for c in containers)
+  placed_volume = sum(o[0] * o[1] * o[2] for c in containers for _, _, o in c.placements)
+  return placed_volume / container_volume if container_volume else 0
+
+
+def run_dataset(load, repeat, maximal_spaces, counters=False, **pack_options):
+  best = None
+  for _ in range(repeat):
+    items, containers = load(maximal_spaces=maximal_spaces)
+    start = time.perf_counter()
+    containers, placed, unplaced = pack_items(containers, items, **pack_options)
+    elapsed = time.perf_counter() - start
+    if best is None or elapsed < best:
+      best = elapsed
+
+  # Separate run for memory, tracing slows packing down too much to time it
+  items, containers = load(maximal_spaces=maximal_spaces)
+  tracemalloc.start()
+  result = pack_items(containers, items, instrument=counters, **pack_options)
+  _, peak_memory = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  stats = {
+      "items": len(items),
+      "placed": len(placed),
+      "seconds": round(best, 4),
+      "items_per_sec": round(len(items) / best, 1) if best else None,
+      "peak_memory_kb": round(peak_memory / 1024, 1),
+      "peak_free_spaces": max(c.free_space_stats["peak"] for c in containers),
+      "fill": round(fill_ratio(containers), 6),
+  }
+  if counters:
+    stats["counters"] = result[3]["total"]
+  return stats
+
+
+def compare(results, baseline, tolerance=THROUGHPUT_TOLERANCE):
+  # Returns a list of human-readable problems; empty means no regression
+  problems = []
+  for name, result in results.items():
+    base = baseline.get(name)
+    if base is None:
+      continue
+    if result["placed"] != base["placed"] or abs(result["fill"] - base["fill"]) > 1e-6:
+      problems.append(f"{name}: packing changed, placed {base['placed']} -> {result['placed']}, "
+                      f"fill {base['fill']:.4f} -> {result['fill']:.4f}")
+    if base["seconds"] >= MIN_TIMED_SECONDS and result["items_per_sec"] < base["items_per_sec"] * (1 - tolerance):
+      problems.append(f"{name}: throughput {base['items_per_sec']:.0f} -> {result['items_per_sec']:.0f} items/sec")
+  return problems
+
+
+def print_table(results, baseline):
+  print(f"{'dataset':<16}{'items':>7}{'placed':>8}{'items/s':>11}{'vs base':>9}"
+        f"{'peak KB':>10}{'spaces':>8}{'fill':>8}")
+  for name, r in results.items():
+    base = baseline.get(name)
+    speedup = f"{r['items_per_sec'] / base['items_per_sec']:.2f}x" if base else "-"
+    print(f"{name:<16}{r['items']:>7}{r['placed']:>8}{r['items_per_sec']:>11.0f}{speedup:>9}"
+          f"{r['peak_memory_kb']:>10.0f}{r['peak_free_spaces']:>8}{r['fill']:>8.3f}")
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Benchmark pack_items over the bundled datasets")
+  parser.add_argument("names", nargs="*", help="only run datasets whose name contains one of these")
+  parser.add_argument("--repeat", type=int, default=3, help="timed runs per dataset, the best is kept")
+  parser.add_argument("--backend", default="object", help="free space backend: object or numpy")
+  parser.add_argument("--maximal", action="store_true", help="use maximal free spaces")
+  parser.add_argument("--no-batch", action="store_true", help="place items one at a time")
+  parser.add_argument("--workers", type=int, default=None)
+  parser.add_argument("--counters", action="store_true", help="record hot-path counters from the memory run")
+  parser.add_argument("--output", default=RESULTS_FILE)
+  parser.add_argument("--baseline", default=BASELINE_FILE)
+  parser.add_argument("--write-baseline", action="store_true", help="save the results as the new baseline")
+  args = parser.parse_args(argv)
+
+  config = {"backend": args.backend, "maximal": args.maximal, "batch": not args.no_batch, "workers": args.workers}
+  results = {}
+  for name, load in datasets().items():
+    if args.names and not any(n in name for n in args.names):
+      continue
+    results[name] = run_dataset(load, args.repeat, args.maximal, args.counters, free_space_backend=args.backend,
+                                batch=not args.no_batch, workers=args.workers)
+
+  try:
+    with open(args.baseline) as f:
+      stored = json.load(f)
+  except FileNotFoundError:
+    stored = {}
+  # Only compare against a baseline measured with the same options
+  baseline = stored.get("datasets", {}) if stored.get("config") == config else {}
+
+  print_table(results, baseline)
+  with open(args.output, "w") as f:
+    json.dump({"config": config, "datasets": results}, f, indent=2)
+  if args.write_baseline:
+    # A partial run only replaces the datasets it measured
+    with open(args.baseline, "w") as f:
+      json.dump({"config": config, "datasets": {**baseline, **results}}, f, indent=2)
+    return 0
+
+  problems = compare(results, baseline)
+  if not baseline:
+    print(f"\nNo baseline for these options in {args.baseline}")
+  for problem in problems:
+    print(problem)
+  return 1 if problems else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,54 @@
+import csv
+from .Item import Item, parse_expiry
+
+ITEM_COLUMNS = ("item_id", "name", "width_cm", "depth_cm", "height_cm", "mass_kg",
+                "priority", "expiry_date", "usage_limit", "preferred_zone")
+BATCH_SIZE = 1000
+
+
+def parse_item_row(row):
+  # Item from one CSV row; raises ValueError with a readable message
+  missing = [column for column in ITEM_COLUMNS if row.get(column) is None]
+  if missing:
+    raise ValueError(f"Missing columns: {', '.join(missing)}")
+  width, depth, height = float(row["width_cm"]), float(row["depth_cm"]), float(row["height_cm"])
+  if width <= 0 or depth <= 0 or height <= 0:
+    raise ValueError("Dimensions must be positive")
+  mass_kg = float(row["mass_kg"])
+  if mass_kg < 0:
+    raise ValueError("Mass must not be negative")
+  usage_limit = row["usage_limit"].strip()
+  return Item(
+      item_id=row["item_id"].strip(),
+      name=row["name"].strip(),
+      width=width,
+      depth=depth,
+      height=height,
+      mass_kg=mass_kg,
+      priority=int(row["priority"]),
+      expiry=parse_expiry(row["expiry_date"].strip()),
+      usage_limit=float("inf") if usage_limit == "N/A" else int(usage_limit),
+      preferred_zone=row["preferred_zone"].strip()
+  )
+
+
+def iter_item_batches(lines, batch_size=BATCH_SIZE, errors=None):
+  """
+  Read an items CSV from a file object (or any iterable of lines) and yield
+  lists of up to batch_size Items as rows arrive, so only one batch of rows
+  is held at a time. Invalid rows are skipped; if errors is a list, each
+  gets {"row": data row number, "message": reason} appended.
+  """
+  batch = []
+  for row_num, row in enumerate(csv.DictReader(lines), start=1):
+    try:
+      batch.append(parse_item_row(row))
+    except (ValueError, TypeError, AttributeError) as e:
+      if errors is not None:
+        errors.append({"row": row_num, "message": str(e)})
+      continue
+    if len(batch) == batch_size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
@@ -0,0 +1,165 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from copy import deepcopy
+from itertools import count, product
+from .Container import ORIENTATION_POLICIES
+from .packing import pack_items, default_sort_key, restore_containers, collect_counters, DeadlineExceeded
+
+SORT_KEYS = {
+    "default": default_sort_key,
+    "priority_volume": lambda i: (i.priority, -(i.width * i.depth * i.height)),
+    "volume": lambda i: -(i.width * i.depth * i.height),
+    "expiry": lambda i: (i.expiry, i.priority),
+    "usage_limit": lambda i: (i.usage_limit, i.priority),
+}
+
+
+def strategies():
+  # Every (sort order, orientation policy) pair, default first, followed by
+  # seeded restarts that shuffle items within each priority level
+  for sort_name, policy in product(SORT_KEYS, ORIENTATION_POLICIES):
+    yield sort_name, policy, None
+  rng = random.Random(0)
+  for seed in count():
+    yield rng.choice(list(SORT_KEYS)), rng.choice(list(ORIENTATION_POLICIES)), seed
+
+
+def score_packing(placed, containers, new_placements):
+  # Higher is better: placed priority first, then volume fill
+  placed_volume = sum(o[0] * o[1] * o[2] for new in new_placements for _, _, o in new)
+  total_volume = sum(c.width * c.height * c.depth for c in containers)
+  return sum(item.priority for item in placed), placed_volume / total_volume if total_volume else 0
+
+
+def run_strategy(containers, items, sort_name, policy, seed, batch, instrument=False, deadline=None):
+  """
+  Pack copies of containers and items with one strategy.
+  Returns (score, strategy, packed containers, new placements per container
+  as (item index, pos, orient)), or None if the time.time() deadline passed
+  first (it is checked between item runs).
+  """
+  containers, items = deepcopy((containers, items))
+  starts = [len(c.placements) for c in containers]
+  index = {id(item): i for i, item in enumerate(items)}
+  sort_key = SORT_KEYS[sort_name]
+  if seed is not None:
+    rng = random.Random(seed)
+    noise = {id(item): rng.random() for item in items}
+    sort_key = lambda i: (i.priority, noise[id(i)])
+  for container in containers:
+    container.orientation_policy = policy
+  try:
+    placed = pack_items(containers, items, batch=batch, sort_key=sort_key, instrument=instrument,
+                        deadline=deadline)[1]
+  except DeadlineExceeded:
+    return None
+
+  new_placements = []
+  for container, start in zip(containers, starts):
+    new_placements.append([(index[id(item)], pos, orient) for item, pos, orient in container.placements[start:]])
+    container.placements = []
+    container.orientation_policy = "default"
+  return score_packing(placed, containers, new_placements), (sort_name, policy, seed), containers, new_placements
+
+
+def pack_items_anytime(containers, items, deadline_ms, workers=None, batch=True, instrument=False, pool=None):
+  """
+  Time-budgeted multi-start packing (see search_strategies); the best
+  packing found is applied to containers.
+  Returns (containers, placed, unplaced, info) where info has the winning
+  strategy, its score and how many strategies were evaluated, plus the
+  winning run's counters (see pack_items) when instrument is set.
+  """
+  best, evaluated = search_strategies(containers, items, deadline_ms, workers, batch, instrument, pool)
+  return apply_strategy(containers, items, best, evaluated, instrument)
+
+
+def places_everything(result, items):
+  # Nothing beats a packing that places every item: its priority sum is the
+  # maximum and its placed volume is fixed
+  return sum(len(new) for new in result[3]) == len(items)
+
+
+def search_strategies(containers, items, deadline_ms, workers=None, batch=True, instrument=False, pool=None):
+  """
+  Run packing strategies on copies of containers and items until
+  deadline_ms runs out or one places every item. With workers > 1 (capped
+  at the spare cores), other sort orders and orientation policies are
+  submitted to worker processes first (to pool, a long-lived
+  ProcessPoolExecutor, if given, else to one made for the call); the
+  default greedy strategy then runs in this process.
+  Returns (best run_strategy result, strategies evaluated); containers are
+  left as they were, see apply_strategy.
+  The default strategy always runs to completion so there is a result, so
+  the call takes the longer of deadline_ms and that run. Every other
+  strategy gives up at the deadline, at the latest after the item run it is
+  placing, whether it runs here or in a worker; queued ones are cancelled.
+  """
+  deadline = time.monotonic() + deadline_ms / 1000
+  wall_deadline = time.time() + deadline_ms / 1000  # Comparable across processes
+  stream = strategies()
+  default = next(stream)
+  parallel = False
+  if workers is not None and workers > 1:
+    # The default strategy keeps one core busy; more workers than the cores
+    # left only slow it down (on one core, strategies run here in turn)
+    workers = min(workers, (os.cpu_count() or 1) - 1)
+    parallel = workers > 0
+  own_pool = None
+  if parallel and pool is None:
+    pool = own_pool = ProcessPoolExecutor(max_workers=workers)
+  pending = set()
+  try:
+    if parallel:
+      for _ in range(workers):
+        pending.add(pool.submit(run_strategy, containers, items, *next(stream), batch, instrument, wall_deadline))
+    best = run_strategy(containers, items, *default, batch, instrument)
+    evaluated = 1
+
+    if parallel:
+      while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not pending or places_everything(best, items):
+          break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for job in done:
+          result = job.result()
+          if result is None:
+            continue
+          evaluated += 1
+          if result[0] > best[0]:
+            best = result
+          if time.monotonic() < deadline and not places_everything(best, items):
+            pending.add(pool.submit(run_strategy, containers, items, *next(stream), batch, instrument,
+                                    wall_deadline))
+    else:
+      while time.monotonic() < deadline and not places_everything(best, items):
+        result = run_strategy(containers, items, *next(stream), batch, instrument, wall_deadline)
+        if result is None:
+          break
+        evaluated += 1
+        if result[0] > best[0]:
+          best = result
+  finally:
+    for job in pending:
+      job.cancel()
+    if own_pool is not None:
+      own_pool.shutdown(wait=False, cancel_futures=True)
+
+  return best, evaluated
+
+
+def apply_strategy(containers, items, best, evaluated, instrument=False):
+  # Applies a search_strategies result to containers in the state it searched
+  # from (the same containers, or ones unchanged since their copies were taken)
+  score, strategy, packed, new_placements = best
+  restore_containers(containers, packed, new_placements, items)
+  placed_ids = {i for new in new_placements for i, _, _ in new}
+  placed = [item for i, item in enumerate(items) if i in placed_ids]
+  unplaced = [item for i, item in enumerate(items) if i not in placed_ids]
+  info = {"strategy": strategy, "score": score, "evaluated": evaluated}
+  if instrument:
+    info["counters"] = collect_counters(containers)
+  return containers, placed, unplaced, info
@@ -1,45 +1,180 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import groupby
+from time import perf_counter, time
+from .Container import add_counters
 
 
-def pack_items(containers, items):
+class DeadlineExceeded(Exception):
+  """Raised by pack_items when its deadline passes between item runs."""
+
+
+def item_runs(items, batch):
+  # Consecutive items with the same shape and preferred zone can be placed as one batch
+  if not batch:
+    return [[item] for item in items]
+  return [list(run) for _, run in groupby(items, key=lambda i: (i.shape, i.preferred_zone))]
+
+
+def containers_by_zone(containers):
+  zone_index = {}
+  for container in containers:
+    zone_index.setdefault(container.zone, []).append(container)
+  return zone_index
+
+
+def default_sort_key(i):
+  return (  # Negative to sort largest first
+      # i.priority,
+      # -(i.width * i.depth * i.height),
+      i.priority,
+      i.priority/(i.width * i.depth * i.height),
+      i.expiry,
+      i.usage_limit)
+
+
+def collect_counters(containers):
+  # Per container hot-path counters and their sum, for instrumented runs
+  per_container = {c.id: c.counters for c in containers if c.counters is not None}
+  total = {}
+  for counters in per_container.values():
+    add_counters(total, counters)
+  return {"total": total, "containers": per_container}
+
+
+def pack_items(containers, items, free_space_backend=None, batch=True, workers=None, sort_key=default_sort_key,
+               instrument=False, deadline=None):
+  """
+  Returns (containers, placed, unplaced). With instrument=True every
+  container's counters are reset first and a fourth element is returned,
+  collect_counters(containers) plus the call's wall time in total["pack_items_time"].
+  deadline is a time.time() value; once it passes, DeadlineExceeded is
+  raised before the next item run, leaving containers partly packed.
+  """
+  start = perf_counter()
+  if free_space_backend is not None:
+    for container in containers:
+      container.set_free_space_backend(free_space_backend)
+  if instrument:
+    for container in containers:
+      container.enable_counters()
+
   # Sort items
-  sorted_items = sorted(
-      items,
-      key=lambda i: (  # Negative to sort largest first
-          # i.priority,
-          # -(i.width * i.depth * i.height),
-          i.priority,
-          i.priority/(i.width * i.depth * i.height),
-          i.expiry,
-          i.usage_limit)
-  )
+  sorted_items = sorted(items, key=sort_key)
 
   placed = []
   unplaced = []
   temp_unplaced = []
+  zone_index = containers_by_zone(containers)
+  other_zone_index = {}
 
-  for item in sorted_items:
-    was_placed = False
-    # Try preferred zone containers first
-    target_containers = [c for c in containers if c.zone == item.preferred_zone]
-    for container in target_containers:
-      if container.place_item(item):
-        placed.append(item)
-        was_placed = True
-        break
-    if not was_placed:
-      temp_unplaced.append(item)
+  # Try preferred zone containers first
+  if workers is not None and workers > 1:
+    placed, temp_unplaced = pack_zones_in_parallel(zone_index, sorted_items, batch, workers)
+  else:
+    place_runs(item_runs(sorted_items, batch), lambda item: zone_index.get(item.preferred_zone, []),
+               placed, temp_unplaced, deadline)
 
   # Try to place remaining items in non-preferred containers
-  for item in temp_unplaced:
-    was_placed = False
-    other_containers = [c for c in containers if c.zone != item.preferred_zone]
-    for container in other_containers:
-      if container.place_item(item):
-        placed.append(item)
-        was_placed = True
-        break
-    if not was_placed:
-      unplaced.append(item)
+  def other_containers(item):
+    zone = item.preferred_zone
+    if zone not in other_zone_index:
+      other_zone_index[zone] = [c for c in containers if c.zone != zone]
+    return other_zone_index[zone]
+
+  place_runs(item_runs(temp_unplaced, batch), other_containers, placed, unplaced, deadline)
+
+  if instrument:
+    counters = collect_counters(containers)
+    counters["total"]["pack_items_time"] = perf_counter() - start
+    return containers, placed, unplaced, counters
+  return containers, placed, unplaced
 
+
+def pack_item_batches(containers, batches, **options):
+  """
+  Packs an iterable of item batches (e.g. from importer.iter_item_batches)
+  as they arrive, so packing starts before a large manifest is fully read.
+  Each batch is sorted and packed on its own, so the order only holds
+  within a batch. Takes pack_items' options except instrument and returns
+  (containers, placed, unplaced) over all batches.
+  """
+  placed = []
+  unplaced = []
+  for batch in batches:
+    _, batch_placed, batch_unplaced = pack_items(containers, batch, **options)
+    placed.extend(batch_placed)
+    unplaced.extend(batch_unplaced)
   return containers, placed, unplaced
+
+
+def place_runs(runs, candidates, placed, not_placed, deadline=None):
+  # Fills candidates(item) in order with each run; leftovers go to not_placed
+  for run in runs:
+    if deadline is not None and time() >= deadline:
+      raise DeadlineExceeded
+    for container in candidates(run[0]):
+      if not container.may_fit(run[0]):
+        continue
+      count = container.place_batch(run)
+      placed.extend(run[:count])
+      run = run[count:]
+      if not run:
+        break
+    not_placed.extend(run)
+
+
+def pack_zone(containers, items, batch):
+  # Worker side of pack_zones_in_parallel. Items come back as indices into
+  # `items`, since the worker only has copies of them.
+  starts = [len(c.placements) for c in containers]
+  index = {id(item): i for i, item in enumerate(items)}
+  placed, unplaced = [], []
+  place_runs(item_runs(items, batch), lambda item: containers, placed, unplaced)
+  new_placements = []
+  for container, start in zip(containers, starts):
+    new_placements.append([(index[id(item)], pos, orient) for item, pos, orient in container.placements[start:]])
+    container.placements = []
+  return containers, new_placements, [index[id(item)] for item in unplaced]
+
+
+def restore_containers(originals, packed, new_placements, items):
+  # Copy worker-side container state onto the caller's containers, mapping
+  # item indices in new_placements back to the caller's Item objects
+  for original, container, new in zip(originals, packed, new_placements):
+    placements = original.placements + [(items[i], pos, orient) for i, pos, orient in new]
+    state = dict(container.__dict__)
+    # Copies come back outside any transaction; the original keeps its own
+    state.pop("undo_log")
+    state.pop("transactions")
+    original.__dict__.update(state)
+    original.placements = placements
+
+
+def pack_zones_in_parallel(zone_index, sorted_items, batch, workers):
+  # Preferred-zone items never compete across zones, so each zone is packed
+  # in its own process; results are put back in sorted item order
+  order = {id(item): i for i, item in enumerate(sorted_items)}
+  zone_items = {}
+  for item in sorted_items:
+    zone_items.setdefault(item.preferred_zone, []).append(item)
+
+  placed = []
+  temp_unplaced = []
+  with ProcessPoolExecutor(max_workers=workers) as pool:
+    jobs = {}
+    for zone, items in zone_items.items():
+      if zone in zone_index:
+        jobs[zone] = pool.submit(pack_zone, zone_index[zone], items, batch)
+      else:
+        temp_unplaced.extend(items)
+    for zone, job in jobs.items():
+      items = zone_items[zone]
+      packed, new_placements, unplaced = job.result()
+      restore_containers(zone_index[zone], packed, new_placements, items)
+      placed.extend(items[i] for new in new_placements for i, _, _ in new)
+      temp_unplaced.extend(items[i] for i in unplaced)
+
+  placed.sort(key=lambda item: order[id(item)])
+  temp_unplaced.sort(key=lambda item: order[id(item)])
+  return placed, temp_unplaced
@@ -1,33 +1,24 @@
 import json
 import csv
+import struct
+import sys
 import time
+from array import array
+from pathlib import Path
 from .Container import Container
 from .Item import Item
+from .importer import iter_item_batches
 from .packing import pack_items
 
 
-def parse_from_csvs(items_csv_path, containers_csv_path):
+def parse_from_csvs(items_csv_path, containers_csv_path, maximal_spaces=False):
   items = []
   containers = []
 
   # Parse items
-  with open(items_csv_path) as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-      expiry_date = row['expiry_date']
-      usage_limit = int(row['usage_limit']) if row['usage_limit'] != "N/A" else float("inf")
-      items.append(Item(
-          item_id=row['item_id'],
-          name=row['name'],
-          width=float(row['width_cm']),
-          depth=float(row['depth_cm']),
-          height=float(row['height_cm']),
-          mass_kg=float(row['mass_kg']),
-          priority=int(row['priority']),
-          expiry=expiry_date,
-          usage_limit=usage_limit,
-          preferred_zone=row['preferred_zone']
-      ))
+  with open(items_csv_path, newline="") as f:
+    for batch in iter_item_batches(f):
+      items.extend(batch)
 
   # Parse containers
   with open(containers_csv_path) as f:
@@ -38,13 +29,14 @@ def parse_from_csvs(items_csv_path, containers_csv_path):
           zone=row['zone'],
           width=float(row['width_cm']),
           depth=float(row['depth_cm']),
-          height=float(row['height_cm'])
+          height=float(row['height_cm']),
+          maximal_spaces=maximal_spaces
       ))
 
   return items, containers
 
 
-def parse_from_json(json_path):
+def parse_from_json(json_path, maximal_spaces=False):
   with open(json_path) as f:
     data = json.load(f)
 
@@ -58,7 +50,8 @@ def parse_from_json(json_path):
         zone="Storage_Bay",  # Default zone
         width=cont["size"]["width"],
         depth=cont["size"]["depth"],
-        height=cont["size"]["height"]
+        height=cont["size"]["height"],
+        maximal_spaces=maximal_spaces
     ))
 
   # Parse items
@@ -79,13 +72,10 @@ def parse_from_json(json_path):
   return items, containers
 
 
-def save_packing_results(containers, output_file):
-  result = {"items": [], "containers": []}
-
+def container_records(containers):
   total_width = 0  # Track cumulative width
   for container in containers:
-    # Add container data
-    container_data = {
+    yield {
         "id": container.id,
         "zone": container.zone,
         "size": {
@@ -96,11 +86,12 @@ def save_packing_results(containers, output_file):
         "position": {"x": total_width, "y": 0, "z": 0}  # Place at current total_width
     }
     total_width += container.width  # Add this container's width for next container
-    result["containers"].append(container_data)
 
-    # Add items data for this container
+
+def item_records(containers):
+  for container in containers:
     for item, (x, y, z), orient in container.placements:
-      item_data = {
+      yield {
           "id": item.id,
           "name": item.name,
           "size": {
@@ -115,10 +106,85 @@ def save_packing_results(containers, output_file):
           },
           "container_id": container.id
       }
-      result["items"].append(item_data)
 
+
+def iter_json_arrays(arrays, indent=2):
+  """
+  Yield the JSON text of an object whose values are arrays, one record at a
+  time, exactly as json.dump(dict(arrays), indent=indent) would write it.
+  arrays is a sequence of (key, iterable of records); indent=None gives
+  compact output without whitespace.
+  """
+  if indent is None:
+    newline, pad, key_sep, separators = "", "", ":", (",", ":")
+  else:
+    newline, pad, key_sep, separators = "\n", " " * indent, ": ", None
+  inner = newline + pad * 2
+  yield "{"
+  for n, (key, records) in enumerate(arrays):
+    yield ("," if n else "") + newline + pad + json.dumps(key) + key_sep + "["
+    count = 0
+    for record in records:
+      # Strings are escaped, so every newline in the text is indentation
+      text = json.dumps(record, indent=indent, separators=separators).replace("\n", inner)
+      yield ("," if count else "") + inner + text
+      count += 1
+    yield (newline + pad if count else "") + "]"
+  yield newline + "}"
+
+
+def iter_packing_results(containers, indent=2):
+  # Visualizer JSON as text chunks, placements streamed container by container
+  return iter_json_arrays((("items", item_records(containers)), ("containers", container_records(containers))),
+                          indent)
+
+
+def save_packing_results(containers, output_file, indent=2):
+  # indent=None writes compact JSON
   with open(output_file, "w") as f:
-    json.dump(result, f, indent=2)
+    f.writelines(iter_packing_results(containers, indent))
+
+
+BINARY_MAGIC = b"PKCB"
+BINARY_VERSION = 1
+
+
+def save_packing_results_binary(containers, output_file, item_ids=True):
+  """
+  Columnar alternative to save_packing_results for large arrangements, read
+  by loadDataset in 3d-visualizer/data/data.js. Little-endian layout:
+    magic "PKCB", uint32 version, uint32 item count N, uint32 metadata length M
+    M bytes of UTF-8 JSON: {"containers": [...], "itemIds": [...]} (itemIds optional)
+    zero padding to a multiple of 4 bytes
+    float32 positions[N * 3] (x, y, z), float32 sizes[N * 3] (width, height, depth),
+    uint32 container indices[N] into the containers list
+  Values use the same conventions as the JSON records (negative depth, z
+  measured from the open face).
+  """
+  positions = array("f")
+  sizes = array("f")
+  container_indices = array("I")
+  ids = []
+  for index, container in enumerate(containers):
+    for item, (x, y, z), orient in container.placements:
+      positions.extend((x, y, z - container.depth))
+      sizes.extend((orient[0], orient[2], -orient[1]))
+      container_indices.append(index)
+      ids.append(item.id)
+
+  metadata = {"containers": list(container_records(containers))}
+  if item_ids:
+    metadata["itemIds"] = ids
+  meta = json.dumps(metadata, separators=(",", ":")).encode()
+  meta += b" " * (-(16 + len(meta)) % 4)  # JSON allows trailing spaces
+  if sys.byteorder == "big":
+    for column in (positions, sizes, container_indices):
+      column.byteswap()
+  with open(output_file, "wb") as f:
+    f.write(BINARY_MAGIC + struct.pack("<III", BINARY_VERSION, len(container_indices), len(meta)))
+    f.write(meta)
+    for column in (positions, sizes, container_indices):
+      column.tofile(f)
 
 
 def verify_packing_results(containers, placed, unplaced):
@@ -162,6 +228,11 @@ def verify_packing_results(containers, placed, unplaced):
     print(f"Container: {container_volume:.1f} cm³")
     print(f"Items: {items_volume:.1f} cm³ ({(items_volume/container_volume)*100:.1f}%)")
     print(f"Free: {free_space:.1f} cm³ ({(free_space/container_volume)*100:.1f}%)")
+    print(f"Free spaces: {len(container.free_space_index)}")
+    if container.maximal_spaces:
+      stats = container.free_space_stats
+      print(f"  - Last trim: {stats['before_prune']} before pruning, {stats['after_prune']} after "
+            f"({stats['pruned']} dominated spaces pruned in total)")
 
   print("\nTotal stats:")
   print(f"Containers: {len(containers)}")
@@ -179,25 +250,35 @@ def verify_packing_results(containers, placed, unplaced):
         f"({((total_container_volume-total_placed_volume)/total_container_volume)*100:.1f}%)")
 
 
+REPO_ROOT = Path(__file__).resolve().parents[2]
+SAMPLES_DIR = REPO_ROOT / "samples-eda" / "samples"
+DATASETS_DIR = REPO_ROOT / "3d-visualizer" / "data"
+
+
 def main():
   start_time = time.time()
 
   # File paths
-  ITEMS_CSV_FILE = r'C:\k26rahul\Code\space-hackathon\samples-eda\samples\input_items.csv'
-  CONTAINERS_CSV_FILE = r'C:\k26rahul\Code\space-hackathon\samples-eda\samples\containers.csv'
-  INPUT_JSON_FILE = r'C:\k26rahul\Code\space-hackathon\3d-visualizer\data\65stairs.json'
-  OUTPUT_JSON_FILE = r'C:\k26rahul\Code\space-hackathon\3d-visualizer\data\output.json'
+  ITEMS_CSV_FILE = SAMPLES_DIR / "input_items.csv"
+  CONTAINERS_CSV_FILE = SAMPLES_DIR / "containers.csv"
+  INPUT_JSON_FILE = DATASETS_DIR / "65stairs.json"
+  OUTPUT_JSON_FILE = DATASETS_DIR / "output.json"
+  OUTPUT_BINARY_FILE = DATASETS_DIR / "output.bin"
+  FREE_SPACE_BACKEND = "object"  # or "numpy"
+  WORKERS = 1  # > 1 packs preferred zones in parallel processes
 
   # Choose your input method:
   items, containers = parse_from_csvs(ITEMS_CSV_FILE, CONTAINERS_CSV_FILE)
   # items, containers = parse_from_json(INPUT_JSON_FILE)
 
-  containers, placed, unplaced = pack_items(containers, items)
+  containers, placed, unplaced = pack_items(containers, items, free_space_backend=FREE_SPACE_BACKEND, workers=WORKERS)
   verify_packing_results(containers, placed, unplaced)
   save_packing_results(containers, OUTPUT_JSON_FILE)
+  save_packing_results_binary(containers, OUTPUT_BINARY_FILE)
 
   end_time = time.time()
   print(f"\nTotal execution time: {end_time - start_time:.2f} seconds")
 
 
-main()
+if __name__ == "__main__":
+  main()
@@ -1,30 +1,176 @@
-from flask import Blueprint, jsonify, request
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from packing.Container import Container
+from packing.Item import Item
+from packing.multistart import apply_strategy, search_strategies
+from stowage import retrieval, waste_management
+from stowage.import_export import iter_arrangement_csv
+from stowage.inventory import InventoryStore
 
 api_routes = Blueprint('api_routes', __name__)
+extensions_lock = threading.Lock()  # Guards creating the per-app objects below
+
+
+def get_inventory():
+  # One store per app, opened from its snapshot and journal on first use
+  with extensions_lock:
+    if 'inventory' not in current_app.extensions:
+      current_app.extensions['inventory'] = InventoryStore(current_app.config['INVENTORY_DIR'])
+  return current_app.extensions['inventory']
+
+
+def get_placement_pool():
+  # Worker processes for /api/placement strategies, started once per app
+  workers = current_app.config['PLACEMENT_WORKERS']
+  if workers is None or workers <= 1:
+    return None
+  with extensions_lock:
+    if 'placement_pool' not in current_app.extensions:
+      current_app.extensions['placement_pool'] = ProcessPoolExecutor(max_workers=workers)
+  return current_app.extensions['placement_pool']
+
+
+def get_search_cache():
+  with extensions_lock:
+    if 'search_cache' not in current_app.extensions:
+      current_app.extensions['search_cache'] = retrieval.SearchCache(current_app.config['SEARCH_CACHE_SIZE'])
+  return current_app.extensions['search_cache']
+
+
+def position_json(pos, orient):
+  return {
+      'startCoordinates': {'width': pos[0], 'depth': pos[2], 'height': pos[1]},
+      'endCoordinates': {'width': pos[0] + orient[0], 'depth': pos[2] + orient[1], 'height': pos[1] + orient[2]}
+  }
+
+
+def placement_request(inventory, container_data, items):
+  """
+  Containers for a placement request, adding unknown ones to the store (known
+  ones keep their stored placements), and the items to pack. Ids already
+  stored, or repeated in the request, would leave two placements under one
+  id, so those items are returned as errors instead. Call with the store
+  locked. Returns (containers, items, errors).
+  """
+  for c in container_data:
+    if c['containerId'] not in inventory.containers:
+      inventory.add_container(Container(
+          container_id=c['containerId'],
+          zone=c['zone'],
+          width=c['width'],
+          depth=c['depth'],
+          height=c['height']
+      ))
+  containers = [inventory.containers[c['containerId']] for c in container_data]
+  errors = []
+  seen = set()
+  new_items = []
+  for item in items:
+    if item.id in inventory.index or item.id in seen:
+      errors.append({'itemId': item.id, 'message': 'Item id already in use'})
+    else:
+      seen.add(item.id)
+      new_items.append(item)
+  return containers, new_items, errors
 
 
 @api_routes.route('/api/placement', methods=['POST'])
 def placement_recommendations():
-  return jsonify({
+  data = request.get_json()
+  items = [Item(
+      item_id=it['itemId'],
+      name=it['name'],
+      width=it['width'],
+      depth=it['depth'],
+      height=it['height'],
+      mass_kg=it.get('mass', 0),
+      priority=it['priority'],
+      expiry=(it.get('expiryDate') or 'N/A')[:10],
+      usage_limit=float('inf') if it.get('usageLimit') is None else it['usageLimit'],
+      preferred_zone=it['preferredZone']
+  ) for it in data['items']]
+  inventory = get_inventory()
+  pool = get_placement_pool()
+  deadline_ms = request.args.get('deadlineMs', current_app.config['PLACEMENT_DEADLINE_MS'], type=int)
+  instrument = current_app.config['PLACEMENT_COUNTERS']
+  with inventory.lock:
+    containers, new_items, errors = placement_request(inventory, data['containers'], items)
+    versions = [container.version for container in containers]
+    copies = deepcopy(containers)
+
+  # Strategies run on the copies, so other requests can use the store until the deadline
+  best, evaluated = search_strategies(copies, new_items, deadline_ms, workers=current_app.config['PLACEMENT_WORKERS'],
+                                      instrument=instrument, pool=pool)
+
+  with inventory.lock:
+    if ([container.version for container in containers] != versions or
+        any(inventory.containers.get(container.id) is not container for container in containers) or
+        any(item.id in inventory.index for item in new_items)):
+      # The store changed meanwhile: pack its current state with the default strategy only
+      containers, new_items, errors = placement_request(inventory, data['containers'], items)
+      best, evaluated = search_strategies(containers, new_items, 0, instrument=instrument)
+    starts = [len(container.placements) for container in containers]
+    containers, placed, unplaced, info = apply_strategy(containers, new_items, best, evaluated, instrument)
+
+    placements = []
+    for container, start in zip(containers, starts):
+      new_placements = container.placements[start:]
+      inventory.record_placements(container, new_placements)
+      for item, pos, orient in new_placements:
+        placements.append({
+            'itemId': item.id,
+            'containerId': container.id,
+            'position': position_json(pos, orient),
+            'rearrangements': []
+        })
+  result = {
       'success': True,
-      'message': 'Placement recommendations endpoint'
-  })
+      'placements': placements,
+      'unplacedItems': [item.id for item in unplaced],
+      'errors': errors
+  }
+  if 'counters' in info:
+    result['counters'] = info['counters']
+  return jsonify(result)
 
 
 @api_routes.route('/api/search', methods=['GET'])
 def search_item():
-  return jsonify({
-      'success': True,
-      'message': 'Item search endpoint'
-  })
+  inventory = get_inventory()
+  with inventory.lock:
+    return jsonify(retrieval.search_item(
+        item_id=request.args.get('itemId'),
+        item_name=request.args.get('itemName'),
+        containers=list(inventory.containers.values()),
+        index=inventory.index,
+        cache=get_search_cache()))
 
 
 @api_routes.route('/api/retrieve', methods=['POST'])
 def retrieve_item():
-  return jsonify({
-      'success': True,
-      'message': 'Item retrieval endpoint'
-  })
+  data = request.get_json()
+  inventory = get_inventory()
+  with inventory.lock:
+    result = retrieval.retrieve_item(data['itemId'], data.get('userId'), data.get('timestamp'),
+                                     list(inventory.containers.values()), index=inventory.index,
+                                     cache=get_search_cache())
+    if result['success'] and inventory.use(data['itemId']) is None:
+      result = {'success': False, 'message': 'Item has no uses left.'}
+  return jsonify(result)
+
+
+@api_routes.route('/api/retrieve/batch', methods=['POST'])
+def retrieve_items():
+  data = request.get_json()
+  inventory = get_inventory()
+  with inventory.lock:
+    result = retrieval.plan_batch_retrieval(data['itemIds'], index=inventory.index)
+    for step in result['retrievalSteps']:
+      if step['action'] == 'retrieve':
+        inventory.use(step['itemId'])
+  return jsonify(result)
 
 
 @api_routes.route('/api/place', methods=['POST'])
@@ -37,18 +183,20 @@ def place_item():
 
 @api_routes.route('/api/waste/identify', methods=['GET'])
 def identify_waste():
-  return jsonify({
-      'success': True,
-      'message': 'Waste identification endpoint'
-  })
+  # Reads the store's waste indexes, cheap enough to poll
+  inventory = get_inventory()
+  with inventory.lock:
+    return jsonify(waste_management.identify_waste(list(inventory.containers.values()), inventory.index))
 
 
 @api_routes.route('/api/waste/return-plan', methods=['POST'])
 def waste_return_plan():
-  return jsonify({
-      'success': True,
-      'message': 'Waste return plan endpoint'
-  })
+  data = request.get_json()
+  inventory = get_inventory()
+  with inventory.lock:
+    return jsonify(waste_management.waste_return_plan(
+        data['undockingContainerId'], data['undockingDate'], data['maxWeight'],
+        list(inventory.containers.values()), index=inventory.index))
 
 
 @api_routes.route('/api/waste/complete-undocking', methods=['POST'])
@@ -85,10 +233,12 @@ def import_containers():
 
 @api_routes.route('/api/export/arrangement', methods=['GET'])
 def export_arrangement():
-  return jsonify({
-      'success': True,
-      'message': 'Export arrangement endpoint'
-  })
+  # Streamed in chunks so large arrangements start sending immediately
+  inventory = get_inventory()
+  with inventory.lock:
+    containers = list(inventory.containers.values())
+  return Response(stream_with_context(iter_arrangement_csv(containers, lock=inventory.lock)), mimetype='text/csv',
+                  headers={'Content-Disposition': 'attachment; filename=arrangement.csv'})
 
 
 @api_routes.route('/api/logs', methods=['GET'])
@@ -1,7 +1,7 @@
 import csv
 import io
-from datetime import datetime
-from .packing import Item, Container
+from packing.Container import Container
+from packing.importer import iter_item_batches
 
 TOL = 1e-6
 
@@ -10,7 +10,9 @@ TOL = 1e-6
 # ----------------------------
 def import_items(csv_data):
   """
-  Import items from a CSV file (provided as a string).
+  Import items from a CSV file (provided as a string or an open file object).
+  File objects are read row by row; use packing.importer.iter_item_batches
+  directly to pack large manifests batch by batch as they are read.
   Returns a dict with:
     - success: boolean
     - itemsImported: number
@@ -19,29 +21,9 @@ def import_items(csv_data):
   """
   errors = []
   items_list = []
-  reader = csv.DictReader(io.StringIO(csv_data.strip()))
-  row_num = 1
-  for row in reader:
-    try:
-      expiry = row["expiry_date"].strip()
-      expiry_date = None if expiry == "N/A" else datetime.strptime(expiry, "%Y-%m-%d")
-      usage_limit = int(row["usage_limit"]) if row["usage_limit"].strip() != "N/A" else float('inf')
-      item = Item(
-        item_id=row["item_id"].strip(),
-        name=row["name"].strip(),
-        width=float(row["width_cm"].strip()),
-        depth=float(row["depth_cm"].strip()),
-        height=float(row["height_cm"].strip()),
-        mass_kg=float(row["mass_kg"].strip()),
-        priority=int(row["priority"].strip()),
-        expiry=expiry_date,
-        usage_limit=usage_limit,
-        preferred_zone=row["preferred_zone"].strip()
-      )
-      items_list.append(item)
-    except Exception as e:
-      errors.append({"row": row_num, "message": str(e)})
-    row_num += 1
+  lines = io.StringIO(csv_data.strip()) if isinstance(csv_data, str) else csv_data
+  for batch in iter_item_batches(lines, errors=errors):
+    items_list.extend(batch)
   return {"success": True, "itemsImported": len(items_list), "errors": errors, "items": items_list}
 
 # ----------------------------
@@ -84,22 +66,56 @@ def import_containers(csv_data):
 # ----------------------------
 # Export Arrangement Function
 # ----------------------------
-def export_arrangement(containers):
+ARRANGEMENT_HEADER = ["Item ID", "Container ID", "Coordinates (W1,D1,H1)", "Coordinates (W2,D2,H2)"]
+CHUNK_ROWS = 1000
+
+def iter_arrangement_csv(containers, chunk_rows=CHUNK_ROWS, lock=None):
   """
-  Export the current arrangement as CSV.
-  Format: Item ID, Container ID, Coordinates (W1,D1,H1), (W2,D2,H2)
-  Returns a CSV string.
+  Yield the arrangement CSV (see export_arrangement) in text chunks of at
+  most chunk_rows rows, container by container, so a large export can be
+  streamed without holding the whole file. With a lock, each container's
+  placements are copied while holding it, so the stream never holds the
+  lock between chunks.
   """
   output = io.StringIO()
   writer = csv.writer(output)
-  writer.writerow(["Item ID", "Container ID", "Coordinates (W1,D1,H1)", "Coordinates (W2,D2,H2)"])
+
+  def take():
+    chunk = output.getvalue()
+    output.seek(0)
+    output.truncate()
+    return chunk
+
+  writer.writerow(ARRANGEMENT_HEADER)
+  rows = 1
   for container in containers:
-    for item, pos, orient in container.placements:
+    placements = container.placements
+    if lock is not None:
+      with lock:
+        placements = list(placements)
+    for item, pos, orient in placements:
       start_coords = f"({pos[0]:.2f},{pos[1]:.2f},{pos[2]:.2f})"
       # End coordinates: start plus placed orientation dimensions.
       end_coords = f"({pos[0] + orient[0]:.2f},{pos[1] + orient[2]:.2f},{pos[2] + orient[1]:.2f})"
       writer.writerow([item.id, container.id, start_coords, end_coords])
-  return output.getvalue()
+      rows += 1
+      if rows == chunk_rows:
+        yield take()
+        rows = 0
+    if rows:
+      yield take()
+      rows = 0
+  if rows:
+    # No containers, header only
+    yield take()
+
+def export_arrangement(containers):
+  """
+  Export the current arrangement as CSV.
+  Format: Item ID, Container ID, Coordinates (W1,D1,H1), (W2,D2,H2)
+  Returns a CSV string; use iter_arrangement_csv to stream it instead.
+  """
+  return "".join(iter_arrangement_csv(containers))
 
 # ----------------------------
 # For debugging: Custom __repr__ for Container
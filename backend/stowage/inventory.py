@@ -0,0 +1,360 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from datetime import datetime
+from functools import lru_cache
+from packing.Container import Container
+from packing.FreeSpace import FreeSpace
+from packing.Item import Item
+from packing.ItemIndex import ItemIndex
+from packing.PlacementTable import PlacementTable
+
+SNAPSHOT_FILE = "snapshot.bin"
+JOURNAL_FILE = "journal.jsonl"
+SNAPSHOT_MAGIC = b"PKIV"
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct("<4sII")  # magic, version, metadata length
+CHECKPOINT_EVENTS = 10000  # Journal events between automatic checkpoints
+
+# Numeric item columns in the snapshot, in file order: (name, typecode, values per item)
+ITEM_COLUMNS = (
+    ("coords", "d", 6),      # x, y, z, width, depth, height of the placement
+    ("dims", "d", 4),        # width, depth, height, mass_kg
+    ("usage_limit", "d", 1),
+    ("priority", "q", 1),
+    ("name", "I", 1),        # Indices into the metadata string tables
+    ("zone", "I", 1),
+    ("expiry", "I", 1),
+)
+
+
+@lru_cache(maxsize=4096)
+def parse_timestamp(value):
+  return datetime.fromisoformat(value)
+
+
+def item_json(item):
+  return {
+      "id": item.id,
+      "name": item.name,
+      "width": item.width,
+      "depth": item.depth,
+      "height": item.height,
+      "mass": item.mass_kg,
+      "priority": item.priority,
+      "expiry": item.expiry.isoformat(),
+      "usageLimit": None if item.usage_limit == float("inf") else item.usage_limit,
+      "preferredZone": item.preferred_zone
+  }
+
+
+def item_from_json(data):
+  usage_limit = data["usageLimit"]
+  return Item(
+      item_id=data["id"],
+      name=data["name"],
+      width=data["width"],
+      depth=data["depth"],
+      height=data["height"],
+      mass_kg=data["mass"],
+      priority=data["priority"],
+      expiry=parse_timestamp(data["expiry"]),
+      usage_limit=float("inf") if usage_limit is None else usage_limit,
+      preferred_zone=data["preferredZone"]
+  )
+
+
+class InventoryStore:
+  """
+  Owns the station's containers and placements and persists them in a
+  directory: an append-only JSON-lines journal of container, place, remove,
+  use and undock events, and a binary snapshot written by checkpoint(). Opening a
+  store memory-maps the snapshot, rebuilds containers from its columns
+  (placements and free spaces are stored as-is, nothing is re-packed) and
+  replays the journal written since. Each checkpoint starts a new journal
+  generation, recorded in the snapshot and in the journal's first line, so
+  a journal the snapshot already contains is never replayed. Callers sharing a store between
+  threads hold store.lock around each read or change, including a pack
+  followed by record_placements.
+  """
+
+  def __init__(self, directory, fsync=False, checkpoint_events=CHECKPOINT_EVENTS):
+    self.directory = directory
+    self.fsync = fsync
+    self.checkpoint_events = checkpoint_events
+    self.containers = {}
+    self.index = ItemIndex()
+    self.lock = threading.RLock()
+    self.generation = 0  # Checkpoints written so far, see checkpoint
+    os.makedirs(directory, exist_ok=True)
+    self.load_snapshot()
+    self.journal_events = self.replay_journal()
+    self.journal = open(self.path(JOURNAL_FILE), "a")
+    if self.journal.tell() == 0:
+      self.write_line({"op": "generation", "generation": self.generation})
+
+  def path(self, name):
+    return os.path.join(self.directory, name)
+
+  def close(self):
+    self.journal.close()
+
+  # ----------------------------
+  # Events
+  # ----------------------------
+  def add_container(self, container):
+    if container.id in self.containers:
+      raise ValueError(f"Container {container.id} already exists")
+    self.apply_container(container)
+    self.write_event({
+        "op": "container", "id": container.id, "zone": container.zone, "width": container.width,
+        "depth": container.depth, "height": container.height, "maximalSpaces": container.maximal_spaces
+    })
+
+  def place(self, item, container_id, pos, orient):
+    # Places item at pos and trims the container's free space
+    if item.id in self.index:
+      raise ValueError(f"Item {item.id} already exists")
+    container = self.containers[container_id]
+    container.place_at(item, pos, orient)
+    self.record_placements(container, [(item, pos, orient)])
+
+  def record_placements(self, container, placements):
+    # Journals placements a packer already applied to one of the store's containers
+    for item, pos, orient in placements:
+      self.index.add(container, item)
+      self.write_event({"op": "place", "container": container.id, "item": item_json(item),
+                        "pos": list(pos), "orient": list(orient)})
+
+  def remove(self, item_id):
+    # Returns the removed item, or None if it is not stored
+    item = self.apply_remove(item_id)
+    if item is not None:
+      self.write_event({"op": "remove", "item": item_id})
+    return item
+
+  def use(self, item_id):
+    # Counts one use of the item, returns it (None if it is not stored or has no uses left)
+    item = self.apply_use(item_id)
+    if item is not None:
+      self.write_event({"op": "use", "item": item_id})
+    return item
+
+  def undock(self, container_id):
+    # Removes the container and everything in it, returns it (None if unknown)
+    container = self.apply_undock(container_id)
+    if container is not None:
+      self.write_event({"op": "undock", "container": container_id})
+    return container
+
+  def apply_container(self, container):
+    self.containers[container.id] = container
+    self.index.add_container(container)
+
+  def apply_remove(self, item_id):
+    container = self.index.discard(item_id)
+    return container.remove_item(item_id) if container is not None else None
+
+  def apply_use(self, item_id):
+    found = self.index.find(item_id)
+    if found is None:
+      return None
+    container, slot = found
+    item = container.placements.items[slot]
+    if item.usage_limit <= 0:
+      return None
+    item.usage_limit -= 1
+    self.index.note_use(item)
+    return item
+
+  def apply_undock(self, container_id):
+    container = self.containers.pop(container_id, None)
+    if container is not None:
+      self.index.discard_container(container)
+      container.touch()
+    return container
+
+  def write_event(self, event):
+    self.write_line(event)
+    self.journal_events += 1
+    if self.journal_events >= self.checkpoint_events:
+      self.checkpoint()
+
+  def write_line(self, event):
+    self.journal.write(json.dumps(event, separators=(",", ":")) + "\n")
+    self.journal.flush()
+    if self.fsync:
+      os.fsync(self.journal.fileno())
+
+  def replay_journal(self):
+    try:
+      f = open(self.path(JOURNAL_FILE), "rb")
+    except FileNotFoundError:
+      return 0
+    events = 0
+    complete = 0  # Bytes up to the end of the last complete line
+    with f:
+      for line in f:
+        if not line.endswith(b"\n"):
+          break  # Torn write from a crash, the event never completed
+        complete += len(line)
+        event = json.loads(line)
+        op = event["op"]
+        if op == "generation":
+          if event["generation"] < self.generation:
+            # Left by a crash during checkpoint, the snapshot already has these events
+            complete = 0
+            break
+          continue
+        if op == "container":
+          self.apply_container(Container(event["id"], event["zone"], event["width"], event["depth"],
+                                         event["height"], maximal_spaces=event["maximalSpaces"]))
+        elif op == "place":
+          item = item_from_json(event["item"])
+          container = self.containers[event["container"]]
+          pos, orient = tuple(event["pos"]), tuple(event["orient"])
+          container.add_placement(item, pos, orient)
+          container.update_free_spaces_with_trim(item, pos, orient)
+          self.index.add(container, item)
+        elif op == "remove":
+          self.apply_remove(event["item"])
+        elif op == "use":
+          self.apply_use(event["item"])
+        elif op == "undock":
+          self.apply_undock(event["container"])
+        events += 1
+      torn = f.seek(0, os.SEEK_END) > complete
+    if torn:
+      # Drop the partial line so appended events start on a line of their own
+      os.truncate(self.path(JOURNAL_FILE), complete)
+    return events
+
+  # ----------------------------
+  # Snapshot
+  # ----------------------------
+  def checkpoint(self):
+    """
+    Write every container to a new snapshot (atomically replacing the old
+    one) and start an empty journal.
+    """
+    tables = {"name": {}, "zone": {}, "expiry": {}}
+    columns = {name: array(typecode) for name, typecode, _ in ITEM_COLUMNS}
+    free_spaces = array("d")
+    ids = []
+    containers = []
+    for container in self.containers.values():
+      spaces = container.free_spaces
+      containers.append({
+          "id": container.id, "zone": container.zone, "width": container.width, "depth": container.depth,
+          "height": container.height, "maximalSpaces": container.maximal_spaces,
+          "backend": container.free_space_backend, "placements": len(container.placements),
+          "freeSpaces": len(spaces)
+      })
+      for fs in spaces:
+        free_spaces.extend((fs.x, fs.y, fs.z, fs.width, fs.height, fs.depth))
+      for item, pos, orient in container.placements:
+        ids.append(item.id)
+        columns["coords"].extend(pos + orient)
+        columns["dims"].extend((item.width, item.depth, item.height, item.mass_kg))
+        columns["usage_limit"].append(item.usage_limit)
+        columns["priority"].append(item.priority)
+        columns["name"].append(tables["name"].setdefault(item.name, len(tables["name"])))
+        columns["zone"].append(tables["zone"].setdefault(item.preferred_zone, len(tables["zone"])))
+        columns["expiry"].append(tables["expiry"].setdefault(item.expiry.isoformat(), len(tables["expiry"])))
+
+    generation = self.generation + 1
+    meta = {"containers": containers, "ids": ids, "generation": generation,
+            **{key: list(table) for key, table in tables.items()}}
+    meta = json.dumps(meta, separators=(",", ":")).encode()
+    meta += b" " * (-(HEADER.size + len(meta)) % 8)  # Keep the columns 8-byte aligned
+    if sys.byteorder == "big":
+      for column in (*columns.values(), free_spaces):
+        column.byteswap()
+
+    tmp = self.path(SNAPSHOT_FILE + ".tmp")
+    with open(tmp, "wb") as f:
+      f.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(meta)))
+      f.write(meta)
+      for name, _, _ in ITEM_COLUMNS:
+        columns[name].tofile(f)
+        # Pad 4-byte columns so the next one stays aligned
+        f.write(b"\0" * (-f.tell() % 8))
+      free_spaces.tofile(f)
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(tmp, self.path(SNAPSHOT_FILE))
+
+    # Everything in the journal is now in the snapshot
+    self.journal.close()
+    self.journal = open(self.path(JOURNAL_FILE), "w")
+    self.generation = generation
+    self.write_line({"op": "generation", "generation": generation})
+    self.journal_events = 0
+
+  def load_snapshot(self):
+    try:
+      f = open(self.path(SNAPSHOT_FILE), "rb")
+    except FileNotFoundError:
+      return
+    with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+      view = memoryview(data)
+      try:
+        self.read_snapshot(view)
+      finally:
+        view.release()
+
+  def read_snapshot(self, view):
+    magic, version, meta_length = HEADER.unpack_from(view)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+      raise ValueError(f"Unsupported inventory snapshot ({magic!r} v{version})")
+    offset = HEADER.size
+    meta = json.loads(bytes(view[offset:offset + meta_length]))
+    offset += meta_length
+    self.generation = meta.get("generation", 0)
+    count = len(meta["ids"])
+
+    columns = {}
+    for name, typecode, width in ITEM_COLUMNS:
+      size = array(typecode).itemsize * width * count
+      column = array(typecode)
+      column.frombytes(view[offset:offset + size])
+      if sys.byteorder == "big":
+        column.byteswap()
+      columns[name] = column
+      offset += size + (-size % 8)
+    free_spaces = array("d")
+    free_spaces.frombytes(view[offset:])
+    if sys.byteorder == "big":
+      free_spaces.byteswap()
+
+    names, zones = meta["name"], meta["zone"]
+    expiries = [parse_timestamp(value) for value in meta["expiry"]]
+    dims, usage = columns["dims"], columns["usage_limit"]
+    items = []
+    for i, item_id in enumerate(meta["ids"]):
+      k = 4 * i
+      usage_limit = usage[i]
+      items.append(Item(item_id, names[columns["name"][i]], dims[k], dims[k + 1], dims[k + 2], dims[k + 3],
+                        columns["priority"][i], expiries[columns["expiry"][i]],
+                        usage_limit if usage_limit == float("inf") else int(usage_limit),
+                        zones[columns["zone"][i]]))
+
+    coords = columns["coords"]
+    start = 0
+    space_start = 0
+    containers = []
+    for data in meta["containers"]:
+      container = Container(data["id"], data["zone"], data["width"], data["depth"], data["height"],
+                            maximal_spaces=data["maximalSpaces"], free_space_backend=data["backend"])
+      end = start + data["placements"]
+      container.placements = PlacementTable.from_columns(items[start:end], coords[6 * start:6 * end])
+      space_end = space_start + data["freeSpaces"]
+      container.free_spaces = [FreeSpace(*free_spaces[6 * k:6 * k + 6]) for k in range(space_start, space_end)]
+      self.containers[container.id] = container
+      containers.append(container)
+      start, space_start = end, space_end
+    self.index.add_containers(containers)
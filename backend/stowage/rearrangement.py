@@ -1,6 +1,15 @@
-from copy import deepcopy
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
 from datetime import datetime
-from .packing import Container, Item, pack_items
+from packing.Container import Container, get_orientations, orientation_table, TOL
+from packing.Item import Item
+from packing.packing import pack_items
+from stowage.retrieval import clear_paths
+
+SEARCH_BUDGET_MS = 500  # Time budget for the eviction search of one item
+MAX_EVICTIONS = 64  # Largest eviction set the search tries
+SEARCH_WORKERS = max(1, (os.cpu_count() or 1) - 1)  # Processes for suggest_rearrangement's searches
 
 # ----------------------------
 # Utility Function: Check Fit
@@ -12,28 +21,174 @@ def can_fit_item(container, item):
   return any(fs.fits(orient) for fs in container.free_spaces for orient in get_orientations(item))
 
 
+# ----------------------------
+# Eviction Search
+# ----------------------------
+def moved_cost(placements):
+  # (moves, total priority, total volume) of taking placements out
+  return (len(placements), sum(p[0].priority for p in placements),
+          sum(o[0] * o[1] * o[2] for _, _, o in placements))
+
+
+def eviction_cost(container, pos, orient, evicted):
+  """
+  moved_cost of clearing the box at pos: the evicted placements, plus the
+  blockers that clear_paths says have to be set aside to pull them out and
+  to push the item in through the open face.
+  """
+  ids = {placement[0].id for placement in evicted}
+  boxes = [(pos, orient)] + [(p_pos, p_orient) for _, p_pos, p_orient in evicted]
+  blockers = [p for p in clear_paths(container, boxes) if p[0].id not in ids]
+  return moved_cost(list(evicted) + blockers)
+
+
+def within_bounds(cost, max_priority, max_volume):
+  return ((max_priority is None or cost[1] <= max_priority) and
+          (max_volume is None or cost[2] <= max_volume + TOL))
+
+
+def search_evictions(container, item, budget_seconds, max_evictions=MAX_EVICTIONS, max_priority=None,
+                     max_volume=None):
+  """
+  Branch and bound over sets of items to take out of container so that
+  item fits. Each branch is a box the item could occupy, one per orientation
+  and anchor corner (the corners of free spaces and placements), and its
+  eviction set is what overlaps the box; the overlap query gives up on a
+  box as soon as the set grows past max_evictions. A box nothing overlaps
+  is a candidate too: free space can be too fragmented for place_item to
+  find it. Sets are costed cheapest first by their own moves, priority and
+  volume, then charged the blockers in front of them (eviction_cost), and
+  the search stops once no remaining set can beat the best. Sets whose
+  removed priority or volume exceed max_priority or max_volume are
+  dropped. Once a set is out its box is empty, so the item always fits there.
+  Returns (moves, total priority, total volume, evicted item ids,
+  (pos, orient)) for the best set found within the budget, or None.
+  """
+  deadline = time.monotonic() + budget_seconds
+  anchors = {(fs.x, fs.y, fs.z) for fs in container.free_spaces}
+  anchors.update(pos for _, pos, _ in container.placements)
+  anchors = sorted(anchors, key=lambda a: (a[2], a[1], a[0]))
+  sets = {}
+  for orient in orientation_table(item.shape, container.orientation_policy):
+    w, d, h = orient
+    for x, y, z in anchors:
+      if time.monotonic() >= deadline:
+        return None
+      if x + w > container.width + TOL or y + h > container.height + TOL or z + d > container.depth + TOL:
+        continue
+      overlapping = container.items_in_box((x, y, z), orient, max_evictions)
+      if overlapping is None:
+        continue
+      ids = tuple(sorted(p[0].id for p in overlapping))
+      if ids not in sets:
+        cost = moved_cost(overlapping)
+        if within_bounds(cost, max_priority, max_volume):
+          sets[ids] = (cost, overlapping, ((x, y, z), orient))
+
+  best = None
+  for base, overlapping, (pos, orient) in sorted(sets.values(), key=lambda s: s[0]):
+    if best is not None and base >= best[:3]:
+      break  # Blockers only add to a set's cost
+    if time.monotonic() >= deadline:
+      return best
+    cost = eviction_cost(container, pos, orient, overlapping)
+    if within_bounds(cost, max_priority, max_volume) and (best is None or cost < best[:3]):
+      best = cost + ([p[0].id for p in overlapping], (pos, orient))
+  return best
+
+
+def find_best_eviction(containers, item, budget_ms=SEARCH_BUDGET_MS, workers=None, pool=None, **search_options):
+  """
+  Run search_evictions on every container, in worker processes when
+  workers > 1 (on pool, a long-lived ProcessPoolExecutor, if given, else on
+  one made for the call), and pick the fewest moves, then the lowest
+  evicted priority and volume, then the earliest container (callers list
+  the preferred zone first). Workers see copies, so only item ids and the
+  box come back. Searches still running at the end of the budget are
+  abandoned.
+  Returns (container, evicted item ids, (pos, orient) of the box) or None.
+  """
+  budget = budget_ms / 1000
+  results = []
+  if workers is not None and workers > 1:
+    own_pool = None
+    if pool is None:
+      pool = own_pool = ProcessPoolExecutor(max_workers=workers)
+    jobs = {}
+    try:
+      jobs = {pool.submit(search_evictions, c, item, budget, **search_options): rank
+              for rank, c in enumerate(containers)}
+      done, _ = wait(jobs, timeout=budget + 1)  # Grace for starting the workers
+      results = [(job.result(), jobs[job]) for job in done]
+    finally:
+      for job in jobs:
+        job.cancel()
+      if own_pool is not None:
+        own_pool.shutdown(wait=False, cancel_futures=True)
+  else:
+    # One shared budget, so later containers get what earlier ones leave
+    deadline = time.monotonic() + budget
+    for rank, container in enumerate(containers):
+      remaining = deadline - time.monotonic()
+      if remaining <= 0:
+        break
+      results.append((search_evictions(container, item, remaining, **search_options), rank))
+
+  found = [(result[:3], rank, result[3], result[4]) for result, rank in results if result is not None]
+  if not found:
+    return None
+  _, rank, evicted, box = min(found)
+  return containers[rank], evicted, box
+
+
 # ----------------------------
 # Rearrangement Plan Generator
 # ----------------------------
-def suggest_rearrangement(containers, new_items):
+def suggest_rearrangement(containers, new_items, budget_ms=SEARCH_BUDGET_MS, workers=SEARCH_WORKERS, pool=None,
+                          **search_options):
   """
   Suggest a rearrangement plan if new items can't fit.
   Returns a dict with:
     - success: boolean
     - plan: list of dicts { "action": "remove/place/placeBack", "item_id": str, "container_id": str }
     - errors: list of dicts { "item_id": str, "message": str }
+  Evictions come from find_best_eviction (budget_ms per item, searched in
+  parallel with workers on pool, or on one pool made for the call, and
+  bounded by search_options such as max_priority and max_volume); if it
+  finds nothing, the lowest-priority items are removed one by one until the
+  item fits.
   """
   plan = []
   errors = []
-  current_containers = deepcopy(containers)
+  own_pool = None
+  if workers is not None and workers > 1 and pool is None:
+    pool = own_pool = ProcessPoolExecutor(max_workers=workers)
+  # Everything below is a what-if on the caller's containers, undone at the end
+  for container in containers:
+    container.begin()
+  try:
+    suggest_in_transaction(containers, new_items, plan, errors, budget_ms, workers, pool, search_options)
+  finally:
+    for container in containers:
+      container.rollback()
+    if own_pool is not None:
+      own_pool.shutdown(wait=False, cancel_futures=True)
+
+  return {
+      "success": len(errors) == 0,
+      "plan": plan,
+      "errors": errors
+  }
 
+
+def suggest_in_transaction(current_containers, new_items, plan, errors, budget_ms, workers, pool, search_options):
   # Try packing without rearrangement first
-  result = pack_items(current_containers, new_items)
-  if not any(item for item in new_items if item not in [placement[0] for container in current_containers for placement in container.placements]):
-    return {"success": True, "plan": plan, "errors": errors}
+  _, _, unplaced = pack_items(current_containers, new_items)
+  if not unplaced:
+    return
 
   # Perform rearrangement suggestions
-  for item in new_items:
+  for item in unplaced:
     target_containers = [c for c in current_containers if c.zone == item.preferred_zone]
     other_containers = [c for c in current_containers if c.zone != item.preferred_zone]
     containers_to_check = target_containers + other_containers
@@ -47,53 +202,65 @@ def suggest_rearrangement(containers, new_items):
     if not item_placed:
       # Rearrangement is needed
       rearrangement_success = False
+      found = find_best_eviction(containers_to_check, item, budget_ms, workers, pool, **search_options)
 
       for container in containers_to_check:
+        if found is not None:
+          if container is not found[0]:
+            continue
+          # The search's box is empty once its set is out, place the item there
+          evicted, (pos, orient) = found[1], found[2]
+          removed_items = [container.remove_item(item_id) for item_id in evicted]
+          container.place_at(item, pos, orient)
+          rearrangement_success = True
+          for removed_item in removed_items:
+            plan.append({"action": "remove", "item_id": removed_item.id, "container_id": container.id})
+          plan.append({"action": "place", "item_id": item.id, "container_id": container.id})
+          place_back(removed_items, containers_to_check, plan, errors)
+          break
+
         removable_items = sorted(container.placements, key=lambda p: p[0].priority)  # Low priority first
         removable_items = [p[0] for p in removable_items]
 
-        # Try removing items to make space
-        temp_container = deepcopy(container)
+        # Try removing items to make space, undone unless the item then fits
+        container.begin()
         removed_items = []
         for candidate_item in removable_items:
-          temp_container.placements = [(i, pos, orient)
-                                       for (i, pos, orient) in temp_container.placements if i.id != candidate_item.id]
-          temp_container.free_spaces = [FreeSpace(0, 0, 0, container.width, container.height, container.depth)]
-          temp_container.merge_free_spaces()
+          container.remove_item(candidate_item.id)
+          removed_items.append(candidate_item)
 
           # Attempt to place the new item
-          if temp_container.place_item(item):
+          if container.place_item(item):
             rearrangement_success = True
+            container.commit()
             # Record removal plan
             for removed_item in removed_items:
               plan.append({"action": "remove", "item_id": removed_item.id, "container_id": container.id})
             # Record placement plan
             plan.append({"action": "place", "item_id": item.id, "container_id": container.id})
             break
-          else:
-            removed_items.append(candidate_item)
 
-        if rearrangement_success:
-          # Place back removed items if possible
-          for removed_item in removed_items:
-            item_replaced = False
-            for retry_container in containers_to_check:
-              if retry_container.place_item(removed_item):
-                plan.append({"action": "placeBack", "item_id": removed_item.id, "container_id": retry_container.id})
-                item_replaced = True
-                break
-            if not item_replaced:
-              errors.append({"item_id": removed_item.id, "message": "Could not reposition item."})
+        if not rearrangement_success:
+          container.rollback()
+        else:
+          place_back(removed_items, containers_to_check, plan, errors)
           break
 
       if not rearrangement_success:
         errors.append({"item_id": item.id, "message": "Insufficient space, even after rearrangement."})
 
-  return {
-      "success": len(errors) == 0,
-      "plan": plan,
-      "errors": errors
-  }
+
+def place_back(removed_items, containers, plan, errors):
+  # Place back removed items if possible
+  for removed_item in removed_items:
+    item_replaced = False
+    for retry_container in containers:
+      if retry_container.place_item(removed_item):
+        plan.append({"action": "placeBack", "item_id": removed_item.id, "container_id": retry_container.id})
+        item_replaced = True
+        break
+    if not item_replaced:
+      errors.append({"item_id": removed_item.id, "message": "Could not reposition item."})
 
 
 # ----------------------------
@@ -1,7 +1,39 @@
+from collections import OrderedDict
 from datetime import datetime
-from .packing import Container, Item  
+from packing.ItemIndex import ItemIndex
 
 TOL = 1e-6
+SEARCH_CACHE_SIZE = 1024
+
+
+class SearchCache:
+  """
+  LRU cache of search responses (which carry the retrieval plan) keyed by
+  (item id, container version). Any change to a container gives it a new
+  version, so its old entries are never hit again and age out.
+  """
+
+  def __init__(self, maxsize=SEARCH_CACHE_SIZE):
+    self.maxsize = maxsize
+    self.entries = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key):
+    result = self.entries.get(key)
+    if result is None:
+      self.misses += 1
+      return None
+    self.entries.move_to_end(key)
+    self.hits += 1
+    return result
+
+  def put(self, key, result):
+    self.entries[key] = result
+    self.entries.move_to_end(key)
+    if len(self.entries) > self.maxsize:
+      self.entries.popitem(last=False)
+
 
 def is_item_visible(item_pos, orient, container):
   x, y, z = item_pos
@@ -9,17 +41,37 @@ def is_item_visible(item_pos, orient, container):
   # Open face is at z = container.depth; item is visible if its front face (z + d) is flush with container.depth.
   return abs((z + d) - container.depth) < TOL
 
+def find_obstructions(container, pos, orient):
+  """
+  Placements that have to come out before the box can be pulled through the
+  open face: those overlapping its width x height footprint in front of it,
+  then those in front of each of them. Returned nearest the open face first,
+  which is the order they can be removed in.
+  """
+  return clear_paths(container, [(pos, orient)])
+
+def clear_paths(container, boxes):
+  # find_obstructions for several boxes at once, each blocker listed once
+  found = {}
+  pending = list(boxes)
+  while pending:
+    box_pos, box_orient = pending.pop()
+    for placement in container.items_in_front(box_pos, box_orient):
+      item, other_pos, other_orient = placement
+      if item.id not in found:
+        found[item.id] = placement
+        pending.append((other_pos, other_orient))
+  # A blocker's back face is never behind the front of what it blocks
+  return sorted(found.values(), key=lambda placement: -placement[1][2])
+
 def generate_retrieval_steps(target_item, container):
   steps = []
-  target_placement = None
-  for item, pos, orient in container.placements:
-    if item.id == target_item.id:
-      target_placement = (item, pos, orient)
-      break
-  if not target_placement:
+  slot = container.placements.slot(target_item.id)
+  if slot is None:
     return steps
-  item, pos, orient = target_placement
-  if is_item_visible(pos, orient, container):
+  item, pos, orient = container.placements[slot]
+  obstructors = [] if is_item_visible(pos, orient, container) else find_obstructions(container, pos, orient)
+  if not obstructors:
     steps.append({
       "step": 0,
       "action": "retrieve",
@@ -28,15 +80,8 @@ def generate_retrieval_steps(target_item, container):
     })
     return steps
   else:
-    obstructors = []
-    target_front = pos[2] + orient[1]
-    for other_item, other_pos, other_orient in container.placements:
-      if other_item.id != target_item.id:
-        other_front = other_pos[2] + other_orient[1]
-        if other_front > target_front + TOL:
-          obstructors.append((other_item, other_pos))
     step_num = 1
-    for obstruct_item, _ in obstructors:
+    for obstruct_item, _, _ in obstructors:
       steps.append({
         "step": step_num,
         "action": "setAside",
@@ -51,7 +96,7 @@ def generate_retrieval_steps(target_item, container):
       "itemName": target_item.name
     })
     step_num += 1
-    for obstruct_item, _ in reversed(obstructors):
+    for obstruct_item, _, _ in reversed(obstructors):
       steps.append({
         "step": step_num,
         "action": "placeBack",
@@ -61,44 +106,100 @@ def generate_retrieval_steps(target_item, container):
       step_num += 1
     return steps
 
-def search_item(item_id=None, item_name=None, containers=None):
+def search_item(item_id=None, item_name=None, containers=None, index=None, cache=None):
+  """
+  Look up an item by id, else by name (the first placed item with that
+  name). Pass the inventory's ItemIndex to make this a hash lookup; without
+  one an index over containers is built for the call. With a SearchCache,
+  the response is reused until the item's container changes; cached
+  responses are shared, so callers must not modify them.
+  """
   if not item_id and not item_name:
     return {"success": False, "found": False, "message": "Please provide itemId or itemName."}
-  for container in containers:
-    for placed_item, pos, orient in container.placements:
-      if (item_id and placed_item.id == item_id) or (item_name and placed_item.name == item_name):
-        retrieval_steps = generate_retrieval_steps(placed_item, container)
-        return {
-          "success": True,
-          "found": True,
-          "item": {
-            "itemId": placed_item.id,
-            "name": placed_item.name,
-            "containerId": container.id,
-            "zone": container.zone,
-            "position": {
-              "startCoordinates": {
-                "width": pos[0],
-                "depth": pos[2],
-                "height": pos[1]
-              },
-              "endCoordinates": {
-                "width": pos[0] + orient[0],
-                "depth": pos[2] + orient[1],
-                "height": pos[1] + orient[2]
-              }
-            }
+  if index is None:
+    index = ItemIndex(containers)
+  found = (index.find(item_id) if item_id else None) or (index.find_name(item_name) if item_name else None)
+  if found is not None:
+    container, slot = found
+    placed_item, pos, orient = container.placements[slot]
+    key = (placed_item.id, container.version)
+    if cache is not None:
+      result = cache.get(key)
+      if result is not None:
+        return result
+    retrieval_steps = generate_retrieval_steps(placed_item, container)
+    result = {
+      "success": True,
+      "found": True,
+      "item": {
+        "itemId": placed_item.id,
+        "name": placed_item.name,
+        "containerId": container.id,
+        "zone": container.zone,
+        "position": {
+          "startCoordinates": {
+            "width": pos[0],
+            "depth": pos[2],
+            "height": pos[1]
           },
-          "retrievalSteps": retrieval_steps
+          "endCoordinates": {
+            "width": pos[0] + orient[0],
+            "depth": pos[2] + orient[1],
+            "height": pos[1] + orient[2]
+          }
         }
+      },
+      "retrievalSteps": retrieval_steps
+    }
+    if cache is not None:
+      cache.put(key, result)
+    return result
   return {"success": True, "found": False, "message": "Item not found in containers."}
 
-def retrieve_item(item_id, user_id, timestamp, containers):
-  search_result = search_item(item_id=item_id, containers=containers)
+def retrieve_item(item_id, user_id, timestamp, containers, index=None, cache=None):
+  search_result = search_item(item_id=item_id, containers=containers, index=index, cache=cache)
   if not search_result.get("found"):
     return {"success": False, "message": "Item not found."}
   return {"success": True}
 
+def plan_batch_retrieval(item_ids, containers=None, index=None):
+  """
+  One step list retrieving every item in item_ids. Items are grouped by
+  container and each container is cleared in a single pass: every blocker of
+  any requested item is set aside once, requested items are retrieved as
+  they are reached (a requested item in front of another is retrieved, not
+  set aside) and the set-aside items go back in reverse order.
+  """
+  if index is None:
+    index = ItemIndex(containers)
+  targets = {}  # container -> {item id: placement}
+  not_found = []
+  for item_id in dict.fromkeys(item_ids):
+    found = index.find(item_id)
+    if found is None:
+      not_found.append(item_id)
+      continue
+    container, slot = found
+    targets.setdefault(container, {})[item_id] = container.placements[slot]
+
+  steps = []
+  for container, wanted in targets.items():
+    blockers = clear_paths(container, [(pos, orient) for _, pos, orient in wanted.values()])
+    blocker_ids = {item.id for item, _, _ in blockers}
+    # Targets nothing else blocks are reached last, after every blocker is out
+    order = blockers + [placement for item_id, placement in wanted.items() if item_id not in blocker_ids]
+    set_aside = []
+    for item, _, _ in order:
+      action = "retrieve" if item.id in wanted else "setAside"
+      if action == "setAside":
+        set_aside.append(item)
+      steps.append({"step": len(steps) + 1, "action": action, "itemId": item.id,
+                    "itemName": item.name, "containerId": container.id})
+    for item in reversed(set_aside):
+      steps.append({"step": len(steps) + 1, "action": "placeBack", "itemId": item.id,
+                    "itemName": item.name, "containerId": container.id})
+  return {"success": not not_found, "retrievalSteps": steps, "notFound": not_found}
+
 if __name__ == "__main__":
   from .packing import parse_items, parse_containers, pack_items
   
@@ -1,52 +1,54 @@
 from datetime import datetime
-from .packing import Container, Item
+from packing.Container import Container
+from packing.Item import Item
+from packing.ItemIndex import ItemIndex
 
 TOL = 1e-6
 
 # ----------------------------
 # Identify Waste Items
 # ----------------------------
-def identify_waste(containers):
+def identify_waste(containers, index=None, now=None):
   """
   Identify waste items from all containers.
   An item is considered waste if its expiry date is past the current date 
   or its usage_limit is 0 (fully used).
+  Waste comes from index (an ItemIndex over containers, built if not given),
+  so with the inventory's index this costs only the waste items found.
   Returns a dict with 'success' and list of 'wasteItems'.
   """
+  if index is None:
+    index = ItemIndex(containers)
+  if now is None:
+    now = datetime.now()
   waste_items = []
-  now = datetime.now()
-  for container in containers:
-    for item, pos, orient in container.placements:
-      reason = None
-      if item.expiry is not None and item.expiry < now:
-        reason = "Expired"
-      elif item.usage_limit <= 0:
-        reason = "Out of Uses"
-      if reason:
-        waste_items.append({
-          "itemId": item.id,
-          "name": item.name,
-          "reason": reason,
-          "containerId": container.id,
-          "position": {
-            "startCoordinates": {
-              "width": pos[0],
-              "depth": pos[1],
-              "height": pos[2]
-            },
-            "endCoordinates": {
-              "width": pos[0] + orient[0],
-              "depth": pos[1] + orient[1],
-              "height": pos[2] + orient[2]
-            }
-          }
-        })
+  for item_id, reason in index.waste(now):
+    container, slot = index.find(item_id)
+    item, pos, orient = container.placements[slot]
+    waste_items.append({
+      "itemId": item.id,
+      "name": item.name,
+      "reason": reason,
+      "containerId": container.id,
+      "position": {
+        "startCoordinates": {
+          "width": pos[0],
+          "depth": pos[1],
+          "height": pos[2]
+        },
+        "endCoordinates": {
+          "width": pos[0] + orient[0],
+          "depth": pos[1] + orient[1],
+          "height": pos[2] + orient[2]
+        }
+      }
+    })
   return {"success": True, "wasteItems": waste_items}
 
 # ----------------------------
 # Generate Waste Return Plan
 # ----------------------------
-def waste_return_plan(undockingContainerId, undockingDate, maxWeight, containers):
+def waste_return_plan(undockingContainerId, undockingDate, maxWeight, containers, index=None):
   """
   Generate a plan for moving waste items for undocking.
   - Collects all waste items.
@@ -54,15 +56,19 @@ def waste_return_plan(undockingContainerId, undockingDate, maxWeight, containers
   - Respects the maxWeight constraint.
   Returns a dict with success flag, returnPlan (list of steps),
   retrievalSteps (if needed), and a returnManifest.
+  Item masses come from index (an ItemIndex over containers, built if not given).
   """
-  waste_result = identify_waste(containers)
+  if index is None:
+    index = ItemIndex(containers)
+  waste_result = identify_waste(containers, index)
   waste_items = waste_result.get("wasteItems", [])
-  
+
+  def item_weight(item_id):
+    item = index.item(item_id)
+    return item.mass_kg if item is not None else 0
+
   # Calculate total weight of waste items
-  total_weight = sum(
-    next((item.mass_kg for container in containers for item, _, _ in container.placements if item.id == waste["itemId"]), 0)
-    for waste in waste_items
-  )
+  total_weight = sum(item_weight(waste["itemId"]) for waste in waste_items)
   
   # If waste exceeds maxWeight, plan to move as many as possible
   planned_items = []
@@ -72,9 +78,9 @@ def waste_return_plan(undockingContainerId, undockingDate, maxWeight, containers
   
   for waste in waste_items:
     # Try to add the waste item if within weight limit
-    item_weight = next((item.mass_kg for container in containers for item, _, _ in container.placements if item.id == waste["itemId"]), 0)
-    if cumulative_weight + item_weight <= maxWeight:
-      cumulative_weight += item_weight
+    weight = item_weight(waste["itemId"])
+    if cumulative_weight + weight <= maxWeight:
+      cumulative_weight += weight
       planned_items.append(waste)
       return_plan_steps.append({
         "step": step,
@@ -114,22 +120,22 @@ def waste_return_plan(undockingContainerId, undockingDate, maxWeight, containers
 # ----------------------------
 # Complete Undocking
 # ----------------------------
-def complete_undocking(undockingContainerId, timestamp, containers):
+def complete_undocking(undockingContainerId, timestamp, containers, index=None):
   """
   Complete the undocking process by removing waste items from containers.
+  Waste is found through index (an ItemIndex over containers, built if not
+  given), and removed items are dropped from it.
   Returns a dict with success flag and number of items removed.
   """
+  if index is None:
+    index = ItemIndex(containers)
+  # Remove items marked as waste (expired or out of uses), freeing their space
+  waste_ids = {}  # container -> item ids
+  for item_id, _ in index.waste(datetime.now()):
+    waste_ids.setdefault(index.discard(item_id), []).append(item_id)
   removed_count = 0
-  for container in containers:
-    # Remove items marked as waste (expired or out of uses)
-    remaining = []
-    for item, pos, orient in container.placements:
-      now = datetime.now()
-      if (item.expiry is not None and item.expiry < now) or (item.usage_limit <= 0):
-        removed_count += 1
-      else:
-        remaining.append((item, pos, orient))
-    container.placements = remaining
+  for container, item_ids in waste_ids.items():
+    removed_count += len(container.remove_items(item_ids))
   return {"success": True, "itemsRemoved": removed_count}
 
 # ----------------------------
@@ -0,0 +1,8 @@
+import random
+from packing.Item import Item
+
+
+def random_items(count, seed=0):
+  rng = random.Random(seed)
+  return [Item(str(i), "Box", *[rng.choice((10, 20, 30)) for _ in range(3)], 1, 1, "N/A", 1, "Z")
+          for i in range(count)]
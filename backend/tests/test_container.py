@@ -0,0 +1,22 @@
+import random
+import pytest
+from packing.Container import Container
+from packing.Item import Item
+from packing.packing import pack_items
+from tests.helpers import random_items
+
+
+@pytest.mark.parametrize("backend", ["object", "numpy"])
+@pytest.mark.parametrize("maximal", [False, True])
+def test_removing_everything_frees_the_whole_container(backend, maximal):
+  container = Container("C", "Z", 100, 100, 100, maximal_spaces=maximal, free_space_backend=backend)
+  pack_items([container], random_items(400))
+  assert len(container.placements) > 50
+
+  item_ids = [item.id for item in container.placements.items]
+  random.Random(1).shuffle(item_ids)
+  for item_id in item_ids:
+    container.remove_item(item_id)
+
+  assert [fs.get_bounds() for fs in container.free_spaces] == [(0, 0, 0, 100, 100, 100)]
+  assert container.place_item(Item("big", "Big", 40, 40, 40, 1, 1, "N/A", 1, "Z"))
@@ -0,0 +1,76 @@
+import os
+import pytest
+from packing.Container import Container
+from packing.Item import Item
+from stowage.inventory import JOURNAL_FILE, InventoryStore
+
+
+def box(item_id):
+  return Item(item_id, "Box", 10, 10, 10, 1, 1, "N/A", 3, "Z")
+
+
+def test_torn_journal_line_is_dropped_before_appending(tmp_path):
+  store = InventoryStore(tmp_path)
+  store.add_container(Container("C", "Z", 100, 100, 100))
+  store.place(box("1"), "C", (0, 0, 0), (10, 10, 10))
+  store.close()
+  with open(os.path.join(tmp_path, JOURNAL_FILE), "a") as f:
+    f.write('{"op":"remove","it')
+
+  store = InventoryStore(tmp_path)
+  store.place(box("2"), "C", (10, 0, 0), (10, 10, 10))
+  store.close()
+
+  store = InventoryStore(tmp_path)
+  assert sorted(store.index.entries) == ["1", "2"]
+  assert store.journal_events == 3
+  store.close()
+
+
+def test_journal_left_by_a_crash_during_checkpoint_is_not_replayed(tmp_path):
+  store = InventoryStore(tmp_path)
+  store.add_container(Container("C", "Z", 100, 100, 100))
+  store.place(box("1"), "C", (0, 0, 0), (10, 10, 10))
+  store.checkpoint()
+  store.place(box("2"), "C", (10, 0, 0), (10, 10, 10))
+  store.use("1")
+  journal_path = os.path.join(tmp_path, JOURNAL_FILE)
+  with open(journal_path) as f:
+    journal = f.read()
+  store.checkpoint()
+  store.close()
+  # Dying between replacing the snapshot and truncating the journal leaves the old journal
+  with open(journal_path, "w") as f:
+    f.write(journal)
+
+  store = InventoryStore(tmp_path)
+  container = store.containers["C"]
+  assert [item.id for item in container.placements.items] == ["1", "2"]
+  assert store.index.item("1").usage_limit == 2
+  store.place(box("3"), "C", (20, 0, 0), (10, 10, 10))
+  store.close()
+  assert sorted(InventoryStore(tmp_path).index.entries) == ["1", "2", "3"]
+
+
+def test_placing_a_stored_item_id_again_is_rejected(tmp_path):
+  store = InventoryStore(tmp_path)
+  store.add_container(Container("C", "Z", 100, 100, 100))
+  store.place(box("1"), "C", (0, 0, 0), (10, 10, 10))
+  with pytest.raises(ValueError):
+    store.place(box("1"), "C", (10, 0, 0), (10, 10, 10))
+  assert len(store.containers["C"].placements) == 1
+  store.close()
+
+
+def test_an_item_with_no_uses_left_is_not_used_again(tmp_path):
+  store = InventoryStore(tmp_path)
+  store.add_container(Container("C", "Z", 100, 100, 100))
+  store.place(Item("1", "Box", 10, 10, 10, 1, 1, "N/A", 1, "Z"), "C", (0, 0, 0), (10, 10, 10))
+  assert store.use("1") is not None
+  assert store.use("1") is None
+  store.close()
+
+  store = InventoryStore(tmp_path)
+  assert store.index.item("1").usage_limit == 0
+  assert store.journal_events == 3
+  store.close()
@@ -0,0 +1,13 @@
+import time
+from packing.Container import Container
+from packing.multistart import pack_items_anytime
+from tests.helpers import random_items
+
+
+def test_stops_once_every_item_is_placed():
+  container = Container("C", "Z", 100, 100, 100)
+  start = time.monotonic()
+  _, placed, unplaced, info = pack_items_anytime([container], random_items(5), 2000)
+  assert len(placed) == 5 and not unplaced
+  assert info["evaluated"] == 1
+  assert time.monotonic() - start < 1
@@ -0,0 +1,61 @@
+from packing.Container import Container
+from packing.Item import Item
+from packing.packing import pack_items
+from stowage.rearrangement import search_evictions, suggest_rearrangement
+from tests.helpers import random_items
+
+
+def box(item_id, w, d, h, priority=1):
+  return Item(item_id, "Box", w, d, h, 1, priority, "N/A", 1, "Z")
+
+
+def state(container):
+  return (list(container.placements), sorted(fs.get_bounds() for fs in container.free_spaces), container.version)
+
+
+def test_suggest_rearrangement_leaves_containers_unchanged():
+  containers = [Container("A", "Z", 100, 100, 100), Container("B", "Z", 100, 100, 100, free_space_backend="numpy")]
+  pack_items(containers, random_items(800))
+  before = [state(container) for container in containers]
+
+  result = suggest_rearrangement(containers, [Item("big", "Big", 40, 40, 40, 1, 1, "N/A", 1, "Z")], budget_ms=200)
+
+  assert any(step["action"] == "place" and step["item_id"] == "big" for step in result["plan"])
+  assert [state(container) for container in containers] == before
+
+
+def test_search_finds_a_free_box_split_across_free_spaces():
+  container = Container("A", "Z", 20, 20, 10)
+  container.place_at(box("a", 10, 10, 10), (0, 0, 0), (10, 10, 10))
+  container.place_at(box("b", 10, 5, 10), (10, 0, 0), (10, 5, 10))
+  item = box("new", 20, 10, 10)
+  assert not any(fs.fits(orient) for fs in container.free_spaces for orient in [(20, 10, 10), (10, 20, 10)])
+
+  assert search_evictions(container, item, 1) == (0, 0, 0, [], ((0, 0, 10), (20, 10, 10)))
+  result = suggest_rearrangement([container], [item])
+  assert result["plan"] == [{"action": "place", "item_id": "new", "container_id": "A"}]
+
+
+def test_search_counts_blockers_in_front_of_evicted_items():
+  # Cheap items at the back, dearer ones in front of them by the open face
+  container = Container("A", "Z", 20, 20, 10)
+  for item_id, pos, priority in (("back1", (0, 0, 0), 1), ("back2", (10, 0, 0), 1),
+                                 ("front1", (0, 0, 10), 50), ("front2", (10, 0, 10), 50)):
+    container.place_at(box(item_id, 10, 10, 10, priority), pos, (10, 10, 10))
+
+  moves, priority, volume, evicted, _ = search_evictions(container, box("new", 10, 10, 10), 1)
+  assert (moves, priority, volume, evicted) == (1, 50, 1000, ["front1"])
+
+
+def test_search_returns_at_the_deadline():
+  container = Container("A", "Z", 20, 20, 10)
+  container.place_at(box("a", 20, 20, 10), (0, 0, 0), (20, 20, 10))
+  assert search_evictions(container, box("new", 10, 10, 10), 0) is None
+
+
+def test_search_respects_the_removed_volume_bound():
+  container = Container("A", "Z", 20, 20, 10)
+  container.place_at(box("a", 20, 20, 10), (0, 0, 0), (20, 20, 10))
+  item = box("new", 10, 10, 10)
+  assert search_evictions(container, item, 1, max_volume=3999) is None
+  assert search_evictions(container, item, 1, max_volume=4000)[3] == ["a"]